@@ -0,0 +1,116 @@
+import copy
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from constants import AUTH_TOKEN_CACHE_PREFIX
+
+
+class TokenUserCache:
+    """
+    Кэш токен -> (пользователь, токен).
+
+    Если задан AUTH_TOKEN_SHARED_CACHE, записи хранятся только в общем
+    кэше Django: инвалидация удаляет запись сразу для всех процессов.
+    Иначе используется LRU-кэш в памяти процесса: записи вытесняются
+    при превышении max_size и устаревают через timeout секунд. Его
+    инвалидация видна только текущему процессу, поэтому без общего
+    кэша он подходит лишь для одного процесса с приложением.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def timeout(self):
+        return settings.AUTH_TOKEN_CACHE_TIMEOUT
+
+    @property
+    def shared(self):
+        alias = settings.AUTH_TOKEN_SHARED_CACHE
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        if self.shared is not None:
+            return self.shared.get(self._shared_key(key))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+        return None
+
+    def set(self, key, value):
+        if self.timeout <= 0:
+            return
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, self.timeout)
+        else:
+            self._store(key, value)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared is not None and keys:
+            self.shared.delete_many([self._shared_key(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_MAX_SIZE:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _shared_key(key):
+        digest = sha256(key.encode()).hexdigest()
+        return f"{AUTH_TOKEN_CACHE_PREFIX}:{digest}"
+
+
+token_user_cache = TokenUserCache()
+
+
+def invalidate_tokens(*keys):
+    """Удаляет токены из кэша аутентификации."""
+    token_user_cache.delete(*keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшированием пользователя по токену.
+
+    На тёплом пути запрос к базе за токеном и пользователем не выполняется.
+    Кэш сбрасывается сигналами при выходе из системы, удалении токена и
+    любом сохранении пользователя (смена пароля, деактивация, профиль).
+    Каждый запрос получает свою копию пользователя, чтобы изменения
+    объекта во view не попадали в кэш.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_user_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_user_cache.set(key, (user, token))
+        else:
+            user, token = cached
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _("User inactive or deleted.")
+                )
+        return copy.copy(user), token
@@ -0,0 +1,125 @@
+import hashlib
+import json
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from constants import SUBSCRIPTIONS_VERSION_KEY
+from foodgram.cache import is_cache_shared
+from recipes.ingredient_index import get_catalog_version
+
+
+def get_subscriptions_version(follower_id):
+    """Версия подписок пользователя для ETag ответов с is_subscribed."""
+    return cache.get_or_set(
+        f"{SUBSCRIPTIONS_VERSION_KEY}:{follower_id}", uuid4().hex, None
+    )
+
+
+def bump_subscriptions_version(follower_id):
+    """Помечает подписки пользователя как изменённые после коммита."""
+    transaction.on_commit(
+        lambda: cache.set(
+            f"{SUBSCRIPTIONS_VERSION_KEY}:{follower_id}", uuid4().hex, None
+        )
+    )
+
+
+def make_etag(*parts):
+    """Слабый ETag по произвольным JSON-сериализуемым значениям."""
+    digest = hashlib.md5(
+        json.dumps(parts, default=str, separators=(",", ":")).encode()
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    """Слабое сравнение ETag с заголовком If-None-Match."""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or any(
+        candidate.removeprefix("W/") == etag.removeprefix("W/")
+        for candidate in etags
+    )
+
+
+def get_conditional_response(request, etag, get_response):
+    """
+    Возвращает 304, если ETag совпадает с If-None-Match, иначе
+    вычисляет ответ через get_response. ETag ставится в оба ответа.
+    Если etag равен None, ответ вычисляется без ETag.
+    """
+    if etag is None:
+        return get_response()
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = get_response()
+    response["ETag"] = etag
+    return response
+
+
+def get_viewer_version(request):
+    """
+    Часть ETag, зависящая от пользователя и формата ответа. None, если
+    пользователь авторизован, а версию его подписок негде хранить так,
+    чтобы её видели все процессы: тогда ответ отдаётся без ETag.
+    """
+    user = request.user
+    if user.is_authenticated and not is_cache_shared():
+        return None
+    return [
+        user.id,
+        get_subscriptions_version(user.id) if user.is_authenticated else None,
+        getattr(request, "accepted_media_type", None),
+    ]
+
+
+def user_etag_part(user):
+    return [
+        user.id,
+        user.username,
+        user.email,
+        user.first_name,
+        user.last_name,
+        user.avatar.name if user.avatar else None,
+    ]
+
+
+def recipe_etag_part(row):
+    """Часть ETag по строке рецепта из RecipeReader.get_values()."""
+    return [
+        row["id"],
+        row["updated_at"],
+        row["favorites_count"],
+        row["author_id"],
+        [value for key, value in row.items() if key.startswith("author__")],
+        row.get("is_favorited"),
+        row.get("is_in_shopping_cart"),
+    ]
+
+
+def get_recipe_etag(request, rows, envelope=None):
+    """ETag рецепта или страницы рецептов вместе с флагами пользователя."""
+    viewer_version = get_viewer_version(request)
+    if viewer_version is None:
+        return None
+    return make_etag(
+        viewer_version,
+        get_catalog_version(),
+        envelope,
+        [recipe_etag_part(row) for row in rows],
+    )
+
+
+def get_user_etag(request, user):
+    """ETag профиля пользователя вместе с флагом is_subscribed."""
+    viewer_version = get_viewer_version(request)
+    if viewer_version is None:
+        return None
+    return make_etag(viewer_version, user_etag_part(user))
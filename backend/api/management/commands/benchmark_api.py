@@ -0,0 +1,258 @@
+import tempfile
+from statistics import quantiles
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.management.fixtures import create_benchmark_viewer
+from recipes.models import Ingredient, Recipe
+
+BENCHMARK_IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAAD"
+    "UlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+# Максимальное число SQL-запросов на эндпоинт. Бюджеты не должны зависеть
+# от размера страницы: списки проверяются и с limit по умолчанию,
+# и с limit=50, чтобы N+1 сразу выходил за пределы бюджета.
+QUERY_BUDGETS = {
+    "recipes: list (anonymous)": 3,
+    "recipes: list": 5,
+    "recipes: list limit=50": 5,
+    "recipes: list ?author": 5,
+    "recipes: list ?fields": 2,
+    "recipes: list ?is_favorited": 5,
+    "recipes: list ?is_in_shopping_cart": 5,
+    "recipes: detail": 4,
+    "recipes: create": 9,
+    "recipes: update": 14,
+    "recipes: update removing ingredients": 14,
+    "recipes: get-link": 0,
+    "recipes: favorite add": 5,
+    "recipes: favorite remove": 4,
+    "recipes: shopping_cart add": 6,
+    "recipes: shopping_cart remove": 6,
+    "recipes: favorite bulk add": 4,
+    "recipes: favorite bulk remove": 4,
+    "recipes: shopping_cart bulk add": 5,
+    "recipes: shopping_cart bulk remove": 6,
+    "recipes: download_shopping_cart": 2,
+    "users: list": 2,
+    "users: list limit=50": 2,
+    "users: detail": 1,
+    "users: me": 1,
+    "users: subscriptions": 3,
+    "users: subscriptions limit=50": 3,
+    "users: subscribe": 6,
+    "users: unsubscribe": 4,
+    "users: relations": 3,
+    "ingredients: list": 0,
+    "ingredients: search": 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint against the current database: SQL "
+        "query count and p50/p95 latency, failing on query budget overruns"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Number of requests per endpoint"
+        )
+
+    def handle(self, *args, **kwargs):
+        iterations = kwargs["iterations"]
+        # Бюджеты считаются для тёплого пути, поэтому версия каталога
+        # продуктов не перечитывается из базы посреди прогона.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            MEDIA_ROOT=media_root,
+            INGREDIENT_CATALOG_VERSION_TTL=float("inf"),
+        ), transaction.atomic():
+            results = self._run(iterations)
+            transaction.set_rollback(True)
+
+        failures = []
+        self.stdout.write(
+            f"{'endpoint':<36} {'status':>6} {'queries':>8} {'budget':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8}"
+        )
+        for name, statuses, queries, timings in results:
+            budget = QUERY_BUDGETS[name]
+            p50, p95 = self._percentiles(timings)
+            line = (
+                f"{name:<36} {'/'.join(map(str, sorted(statuses))):>6} "
+                f"{queries:>8} {budget:>7} {p50:>8.2f} {p95:>8.2f}"
+            )
+            if queries > budget or any(status >= 500 for status in statuses):
+                failures.append(name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if failures:
+            raise CommandError(
+                "Query budget exceeded or server error: "
+                + ", ".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("All endpoints within budget."))
+
+    def _run(self, iterations):
+        viewer, own_recipe, recipe, author = self._prepare_viewer()
+        anonymous = APIClient()
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=viewer)}"
+        )
+        # Прогрев кэша токенов и индекса продуктов: бюджеты считаются для
+        # тёплого пути.
+        client.get("/api/users/me/")
+        anonymous.get("/api/ingredients/")
+        ingredients = [
+            {"id": pk, "amount": amount}
+            for amount, pk in enumerate(
+                Ingredient.objects.values_list("id", flat=True)[:10], start=1
+            )
+        ]
+        search = Ingredient.objects.values_list("name", flat=True)[0][:2]
+        bulk_recipes = {
+            "recipes": list(
+                Recipe.objects.exclude(author=viewer).values_list(
+                    "id", flat=True
+                )[20:40]
+            )
+        }
+        relations = "&".join(
+            [f"users={author.id}", f"users={viewer.id}"]
+            + [f"recipes={pk}" for pk in bulk_recipes["recipes"]]
+        )
+        recipe_data = {
+            "name": "Benchmark",
+            "text": "Benchmark recipe.",
+            "cooking_time": 9,
+            "ingredients": ingredients,
+        }
+        scenarios = [
+            ("recipes: list (anonymous)", anonymous, "get",
+             "/api/recipes/", None),
+            ("recipes: list", client, "get", "/api/recipes/", None),
+            ("recipes: list limit=50", client, "get",
+             "/api/recipes/?limit=50", None),
+            ("recipes: list ?author", client, "get",
+             f"/api/recipes/?author={author.id}", None),
+            ("recipes: list ?fields", client, "get",
+             "/api/recipes/?limit=50&fields=id,name,image,cooking_time",
+             None),
+            ("recipes: list ?is_favorited", client, "get",
+             "/api/recipes/?is_favorited=1", None),
+            ("recipes: list ?is_in_shopping_cart", client, "get",
+             "/api/recipes/?is_in_shopping_cart=1", None),
+            ("recipes: detail", client, "get",
+             f"/api/recipes/{recipe.id}/", None),
+            ("recipes: create", client, "post", "/api/recipes/",
+             {**recipe_data, "image": BENCHMARK_IMAGE}),
+            ("recipes: update", client, "patch",
+             f"/api/recipes/{own_recipe.id}/",
+             {**recipe_data, "ingredients": ingredients[::-1]}),
+            ("recipes: update removing ingredients", client, "patch",
+             f"/api/recipes/{own_recipe.id}/",
+             {**recipe_data, "ingredients": ingredients[:1]}),
+            ("recipes: get-link", client, "get",
+             f"/api/recipes/{recipe.id}/get-link/", None),
+            ("recipes: favorite add", client, "post",
+             f"/api/recipes/{recipe.id}/favorite/", None),
+            ("recipes: favorite remove", client, "delete",
+             f"/api/recipes/{recipe.id}/favorite/", None),
+            ("recipes: shopping_cart add", client, "post",
+             f"/api/recipes/{recipe.id}/shopping_cart/", None),
+            ("recipes: shopping_cart remove", client, "delete",
+             f"/api/recipes/{recipe.id}/shopping_cart/", None),
+            ("recipes: favorite bulk add", client, "post",
+             "/api/recipes/favorite/", bulk_recipes),
+            ("recipes: favorite bulk remove", client, "delete",
+             "/api/recipes/favorite/", bulk_recipes),
+            ("recipes: shopping_cart bulk add", client, "post",
+             "/api/recipes/shopping_cart/", bulk_recipes),
+            ("recipes: shopping_cart bulk remove", client, "delete",
+             "/api/recipes/shopping_cart/", bulk_recipes),
+            ("recipes: download_shopping_cart", client, "get",
+             "/api/recipes/download_shopping_cart/", None),
+            ("users: list", client, "get", "/api/users/", None),
+            ("users: list limit=50", client, "get",
+             "/api/users/?limit=50", None),
+            ("users: detail", client, "get", f"/api/users/{author.id}/", None),
+            ("users: me", client, "get", "/api/users/me/", None),
+            ("users: subscriptions", client, "get",
+             "/api/users/subscriptions/?recipes_limit=3", None),
+            ("users: subscriptions limit=50", client, "get",
+             "/api/users/subscriptions/?limit=50&recipes_limit=3", None),
+            ("users: subscribe", client, "post",
+             f"/api/users/{author.id}/subscribe/", None),
+            ("users: unsubscribe", client, "delete",
+             f"/api/users/{author.id}/subscribe/", None),
+            ("users: relations", client, "get",
+             f"/api/users/me/relations/?{relations}", None),
+            ("ingredients: list", anonymous, "get", "/api/ingredients/", None),
+            ("ingredients: search", anonymous, "get",
+             f"/api/ingredients/?name={search}", None),
+        ]
+
+        results = {
+            name: [set(), 0, []] for name, *_ in scenarios
+        }
+        for _ in range(iterations):
+            for name, api_client, method, url, data in scenarios:
+                with CaptureQueriesContext(connection) as queries:
+                    started = perf_counter()
+                    response = getattr(api_client, method)(
+                        url, data, format="json"
+                    )
+                    if getattr(response, "streaming", False):
+                        b"".join(response.streaming_content)
+                    elapsed = perf_counter() - started
+                statuses, max_queries, timings = results[name]
+                statuses.add(response.status_code)
+                results[name][1] = max(max_queries, len(queries))
+                timings.append(elapsed * 1000)
+        return [(name, *result) for name, result in results.items()]
+
+    @staticmethod
+    def _prepare_viewer():
+        """
+        Создаёт пользователя с подписками, избранным, корзиной и своим
+        рецептом, чтобы персональные флаги в ответах были заполнены.
+        """
+        recipes = list(Recipe.objects.order_by("-created_at")[:20])
+        if not recipes:
+            raise CommandError(
+                "No recipes found, run generate_data first."
+            )
+        recipe = recipes[0]
+        # Чужой рецепт и его автор остаются без подписки, избранного и
+        # корзины, чтобы эндпоинты добавления отвечали 201.
+        viewer = create_benchmark_viewer([
+            other for other in recipes[1:]
+            if other.author_id != recipe.author_id
+        ])
+        own_recipe = Recipe.objects.create(
+            name="Benchmark",
+            text="Benchmark recipe.",
+            image=recipes[0].image,
+            author=viewer,
+            cooking_time=10,
+        )
+        return viewer, own_recipe, recipe, recipe.author
+
+    @staticmethod
+    def _percentiles(timings):
+        if len(timings) < 2:
+            return timings[0], timings[0]
+        cuts = quantiles(timings, n=20, method="inclusive")
+        return cuts[9], cuts[18]
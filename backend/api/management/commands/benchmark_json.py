@@ -0,0 +1,135 @@
+import base64
+import os
+import uuid
+from decimal import Decimal
+from io import BytesIO
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import ORJSONParser, orjson
+from api.renderers import ORJSONRenderer
+from api.serializers import IngredientSerializer, RecipeSerializer
+from api.views import get_recipe_queryset
+from recipes.models import Ingredient
+
+# Размер изображения в теле запроса на создание рецепта (в байтах).
+BENCHMARK_IMAGE_SIZE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that ORJSONRenderer and ORJSONParser match DRF's "
+        "JSONRenderer and JSONParser and compare their speed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Number of timed runs per payload and implementation"
+        )
+
+    def handle(self, *args, **kwargs):
+        if orjson is None:
+            raise CommandError("orjson is not installed.")
+        iterations = kwargs["iterations"]
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            payloads = self._get_payloads()
+
+        mismatches = []
+        self.stdout.write(
+            f"{'payload':<28} {'KB':>8} {'json ms':>9} {'orjson ms':>10} "
+            f"{'speedup':>8}"
+        )
+        for name, data in payloads:
+            expected = JSONRenderer().render(data)
+            if ORJSONRenderer().render(data) != expected:
+                mismatches.append(f"render {name}")
+            self._write_timings(
+                f"render {name}", len(expected), iterations,
+                lambda renderer: renderer.render(data),
+                (JSONRenderer(), ORJSONRenderer()),
+            )
+
+        body = JSONRenderer().render({
+            "name": "Benchmark",
+            "text": "Benchmark recipe.",
+            "cooking_time": 9,
+            "ingredients": [{"id": 1, "amount": 10}],
+            "image": "data:image/png;base64," + base64.b64encode(
+                os.urandom(BENCHMARK_IMAGE_SIZE)
+            ).decode(),
+        })
+        if ORJSONParser().parse(BytesIO(body)) != JSONParser().parse(
+            BytesIO(body)
+        ):
+            mismatches.append("parse recipe with image")
+        self._write_timings(
+            "parse recipe with image", len(body), iterations,
+            lambda parser: parser.parse(BytesIO(body)),
+            (JSONParser(), ORJSONParser()),
+        )
+
+        if mismatches:
+            raise CommandError(
+                "orjson output differs from DRF: " + ", ".join(mismatches)
+            )
+        self.stdout.write(self.style.SUCCESS("Outputs are identical."))
+
+    @staticmethod
+    def _get_payloads():
+        """Каталог продуктов, страница из 100 рецептов и редкие типы."""
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        recipes = list(
+            get_recipe_queryset(request.user).order_by(
+                "-created_at", "-id"
+            )[:100]
+        )
+        return [
+            (
+                "ingredients",
+                IngredientSerializer(Ingredient.objects.all(), many=True).data,
+            ),
+            (
+                "recipes limit=100",
+                RecipeSerializer(
+                    recipes, many=True, context={"request": request}
+                ).data,
+            ),
+            (
+                "mixed types",
+                {
+                    "created": timezone.now(),
+                    "date": timezone.now().date(),
+                    "price": Decimal("10.50"),
+                    "detail": gettext_lazy("Not found."),
+                    "uuid": uuid.uuid4(),
+                    "text": "line\u2028separator\u2029",
+                    1: "integer key",
+                },
+            ),
+            ("integer above 64 bits", {"id": 10 ** 20}),
+        ]
+
+    def _write_timings(self, name, size, iterations, run, implementations):
+        timings = []
+        for implementation in implementations:
+            started = perf_counter()
+            for _ in range(iterations):
+                run(implementation)
+            timings.append((perf_counter() - started) / iterations)
+        slow, fast = timings
+        self.stdout.write(
+            f"{name:<28} {size / 1024:>8.1f} {slow * 1000:>9.2f} "
+            f"{fast * 1000:>10.2f} {slow / fast:>7.1f}x"
+        )
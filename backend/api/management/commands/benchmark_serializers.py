@@ -0,0 +1,158 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.management.fixtures import create_benchmark_viewer
+from api.readers import RecipeReader
+from api.serializers import RecipeSerializer
+from api.views import get_recipe_queryset
+from recipes.models import Recipe
+from users.models import User
+
+# Наборы ?fields= и ?expand=, на которых сравниваются оба пути чтения.
+VARIANTS = (
+    ("full", None, set()),
+    ("card", {"id", "name", "image", "cooking_time"}, set()),
+    ("collapsed author", {"id", "name", "author"}, set()),
+    ("expanded author", {"id", "name"}, {"author"}),
+    (
+        "flags and ingredients",
+        {
+            "id", "ingredients", "is_favorited", "is_in_shopping_cart",
+            "favorites_count",
+        },
+        set(),
+    ),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that RecipeReader renders byte-identical JSON to "
+        "RecipeSerializer and compare the throughput of both read paths"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=50,
+            help="Number of recipes per list"
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Number of timed runs per variant and read path"
+        )
+
+    def handle(self, *args, **kwargs):
+        if not Recipe.objects.exists():
+            raise CommandError("No recipes found, run generate_data first.")
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), transaction.atomic():
+            viewer = self._prepare_viewer(kwargs["limit"])
+            mismatches = self._check_parity(viewer, kwargs["limit"])
+            results = self._benchmark(
+                viewer, kwargs["limit"], kwargs["iterations"]
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'variant':<24} {'serializer ms':>14} {'reader ms':>10} "
+            f"{'recipes/s':>10} {'speedup':>8}"
+        )
+        for name, slow, fast, recipes in results:
+            self.stdout.write(
+                f"{name:<24} {slow * 1000:>14.2f} {fast * 1000:>10.2f} "
+                f"{recipes / fast:>10.0f} {slow / fast:>7.1f}x"
+            )
+        if mismatches:
+            raise CommandError(
+                "RecipeReader output differs from RecipeSerializer: "
+                + ", ".join(mismatches)
+            )
+        self.stdout.write(self.style.SUCCESS("Outputs are byte-identical."))
+
+    @staticmethod
+    def _prepare_viewer(limit):
+        """
+        Создаёт пользователя с подписками, избранным и корзиной на первой
+        странице, чтобы персональные флаги в ответах были заполнены.
+        Одному из авторов ставится аватар, чтобы сравнивались и ссылки.
+        """
+        recipes = list(Recipe.objects.order_by("-created_at")[:limit])
+        User.objects.filter(pk=recipes[0].author_id).update(
+            avatar=recipes[0].image.name
+        )
+        return create_benchmark_viewer(recipes)
+
+    @staticmethod
+    def _make_request(user):
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = user
+        return request
+
+    @staticmethod
+    def _serialize(request, fields, expand, limit, many=True):
+        queryset = get_recipe_queryset(request.user, fields, expand)
+        context = {"request": request, "fields": fields, "expand": expand}
+        if not many:
+            return RecipeSerializer(queryset.first(), context=context).data
+        return RecipeSerializer(
+            list(queryset.order_by("-created_at", "-id")[:limit]),
+            many=True,
+            context=context,
+        ).data
+
+    @staticmethod
+    def _read(request, fields, expand, limit, many=True):
+        reader = RecipeReader(request, fields, expand)
+        queryset = reader.get_values(
+            get_recipe_queryset(request.user, fields, expand)
+        )
+        if not many:
+            return reader.read([queryset.first()])[0]
+        return reader.read(
+            list(queryset.order_by("-created_at", "-id")[:limit])
+        )
+
+    def _check_parity(self, viewer, limit):
+        """Названия вариантов, в которых JSON двух путей различается."""
+        renderer = JSONRenderer()
+        mismatches = []
+        for user in (AnonymousUser(), viewer):
+            request = self._make_request(user)
+            for name, fields, expand in VARIANTS:
+                for many in (True, False):
+                    expected = renderer.render(
+                        self._serialize(request, fields, expand, limit, many)
+                    )
+                    actual = renderer.render(
+                        self._read(request, fields, expand, limit, many)
+                    )
+                    if actual != expected:
+                        kind = "list" if many else "detail"
+                        viewer_kind = (
+                            "viewer" if user.is_authenticated else "anonymous"
+                        )
+                        mismatches.append(f"{name} ({kind}, {viewer_kind})")
+        return mismatches
+
+    def _benchmark(self, viewer, limit, iterations):
+        """Среднее время списка на каждом пути: запросы и сериализация."""
+        request = self._make_request(viewer)
+        results = []
+        for name, fields, expand in VARIANTS:
+            timings = []
+            for build in (self._serialize, self._read):
+                started = perf_counter()
+                for _ in range(iterations):
+                    recipes = len(build(request, fields, expand, limit))
+                timings.append((perf_counter() - started) / iterations)
+            results.append((name, *timings, recipes))
+        return results
@@ -0,0 +1,34 @@
+from recipes.models import Favorite, ShoppingCart
+from recipes.shopping_cart import rebuild_cart_totals
+from users.models import Subscription, User
+
+BENCHMARK_USERNAME = "benchmark-viewer"
+
+
+def create_benchmark_viewer(recipes):
+    """
+    Создаёт пользователя для команд benchmark_*: он подписан на авторов
+    каждого второго из recipes, добавил каждый второй рецепт в избранное
+    и каждый третий в корзину, чтобы персональные флаги в ответах были
+    заполнены.
+    """
+    viewer = User.objects.create_user(
+        username=BENCHMARK_USERNAME,
+        email=f"{BENCHMARK_USERNAME}@example.com",
+        first_name="Benchmark",
+        last_name="Viewer",
+        password="benchmark-password",
+    )
+    Subscription.objects.bulk_create(
+        Subscription(follower=viewer, author_id=author_id)
+        for author_id in {recipe.author_id for recipe in recipes[::2]}
+    )
+    for model, selected in (
+        (Favorite, recipes[::2]),
+        (ShoppingCart, recipes[::3]),
+    ):
+        model.objects.bulk_create(
+            model(user=viewer, recipe=recipe) for recipe in selected
+        )
+    rebuild_cart_totals([viewer.id])
+    return viewer
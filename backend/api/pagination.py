@@ -1,11 +1,253 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 from constants import (
+    PAGES_PAGINATION_CURSOR_MODE,
+    PAGES_PAGINATION_COUNT_CACHE_PREFIX,
+    PAGES_PAGINATION_COUNT_VERSION_KEY,
+    PAGES_PAGINATION_CURSOR_QUERY_PARAM,
+    PAGES_PAGINATION_MODE_QUERY_PARAM,
     PAGES_PAGINATION_PAGE_SIZE_QUERY_PARAM,
     PAGES_PAGINATION_PAGE_SIZE 
 )
 
 
+def invalidate_pagination_counts():
+    """Сбрасывает все закэшированные количества объектов."""
+    try:
+        cache.incr(PAGES_PAGINATION_COUNT_VERSION_KEY)
+    except ValueError:
+        cache.set(PAGES_PAGINATION_COUNT_VERSION_KEY, 1, None)
+
+
+class CountingPaginator(Paginator):
+    """
+    Paginator с кэшированием количества объектов.
+
+    Точное значение COUNT(*) хранится в кэше короткое время. Для
+    нефильтрованных выборок из больших таблиц PostgreSQL вместо
+    COUNT(*) используется оценка pg_class.reltuples.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+
+    @cached_property
+    def count(self):
+        if self.cache_key is None:
+            return super().count
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = self._estimate_count()
+            if count is None:
+                count = super().count
+            cache.set(
+                self.cache_key,
+                count,
+                settings.PAGINATION_COUNT_CACHE_TIMEOUT
+            )
+        return count
+
+    def _estimate_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql" or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if not row or row[0] < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return row[0]
+
+
 class PagesPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с опциональным keyset-режимом.
+
+    Если у представления задан атрибут keyset_ordering, клиент может
+    запросить режим курсоров параметром ?pagination=cursor: страницы
+    выбираются по условию на ключ сортировки, без COUNT(*) и OFFSET,
+    а ответ содержит непрозрачные курсоры next/previous.
+    """
+
     page_size_query_param = PAGES_PAGINATION_PAGE_SIZE_QUERY_PARAM
     page_size = PAGES_PAGINATION_PAGE_SIZE
+    cursor_query_param = PAGES_PAGINATION_CURSOR_QUERY_PARAM
+    invalid_cursor_message = "Неверный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_ordering = getattr(view, "keyset_ordering", None)
+        self.use_keyset = bool(self.keyset_ordering) and (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(PAGES_PAGINATION_MODE_QUERY_PARAM)
+            == PAGES_PAGINATION_CURSOR_MODE
+        )
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+        return self._paginate_keyset(queryset, request)
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountingPaginator(
+            queryset,
+            page_size,
+            cache_key=self._count_cache_key(self.request)
+        )
+
+    def _count_cache_key(self, request):
+        """Ключ зависит от эндпоинта, фильтров и пользователя."""
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key not in (self.page_query_param, self.page_size_query_param)
+            for value in values
+        )
+        user_id = request.user.pk if request.user.is_authenticated else None
+        digest = hashlib.md5(
+            json.dumps([request.path, params, user_id]).encode()
+        ).hexdigest()
+        version = cache.get(PAGES_PAGINATION_COUNT_VERSION_KEY, 0)
+        return f"{PAGES_PAGINATION_COUNT_CACHE_PREFIX}:{version}:{digest}"
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        return self._build_link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_keyset:
+            return super().get_previous_link()
+        return self._build_link(self.previous_position, reverse=True)
+
+    def _paginate_keyset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, reverse = self._decode_cursor(
+            request.query_params.get(self.cursor_query_param), queryset.model
+        )
+        ordering = self.keyset_ordering
+        if reverse:
+            ordering = [self._invert(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = self._position(results[-1])
+        if results and (has_more if reverse else position is not None):
+            self.previous_position = self._position(results[0])
+        return results
+
+    def _position(self, instance):
+        """Позиция объекта или строки .values() в ключе сортировки."""
+        position = []
+        for field in self.keyset_ordering:
+            name = field.lstrip("-")
+            value = (
+                instance[name] if isinstance(instance, dict)
+                else getattr(instance, name)
+            )
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _after(ordering, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": position[index]})
+            for prev_field, prev_value in zip(ordering[:index], position):
+                step &= Q(**{prev_field.lstrip("-"): prev_value})
+            condition |= step
+        return condition
+
+    def _decode_cursor(self, encoded, model):
+        """
+        Разбирает курсор и приводит позицию к типам полей сортировки.
+        Любой испорченный курсор даёт 404, а не ошибку в запросе к базе.
+        """
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = payload["p"], bool(payload["r"])
+        except (
+            binascii.Error, KeyError, TypeError, UnicodeDecodeError,
+            ValueError
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.keyset_ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self._clean_position_value(model, field, value)
+                for field, value in zip(self.keyset_ordering, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _clean_position_value(model, field, value):
+        if value is None:
+            raise ValueError("Empty cursor position.")
+        model_field = model._meta.get_field(field.lstrip("-"))
+        value = model_field.to_python(value)
+        model_field.run_validators(value)
+        return value
+
+    def _build_link(self, position, reverse):
+        if position is None:
+            return None
+        encoded = base64.urlsafe_b64encode(
+            json.dumps({"p": position, "r": int(reverse)}).encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, encoded)
@@ -0,0 +1,128 @@
+from django.db import connection, transaction
+
+from .conditional import bump_subscriptions_version
+from .pagination import invalidate_pagination_counts
+from .response_cache import invalidate_recipe_responses
+from recipes.counters import change_counter
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.shopping_cart import add_recipes_to_cart_totals
+from users.models import Subscription
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def add_user_recipes(model, user_id, recipe_ids):
+    """
+    Добавляет рецепты в избранное или корзину одним
+    INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    Возвращает множество id рецептов, которые были добавлены.
+    Несуществующие рецепты и уже добавленные пропускаются.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return set()
+    table = connection.ops.quote_name(model._meta.db_table)
+    recipes = connection.ops.quote_name(Recipe._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, recipe_id) "
+            f"SELECT %s, id FROM {recipes} "
+            f"WHERE id IN ({_placeholders(recipe_ids)}) "
+            f"ON CONFLICT (user_id, recipe_id) DO NOTHING "
+            f"RETURNING recipe_id",
+            [user_id, *recipe_ids]
+        )
+        added = {recipe_id for recipe_id, in cursor.fetchall()}
+        change_counter(model, added, 1)
+        if added and model is ShoppingCart:
+            add_recipes_to_cart_totals(user_id, added)
+    if added:
+        invalidate_pagination_counts()
+        if model is Favorite:
+            transaction.on_commit(
+                lambda: invalidate_recipe_responses(*added)
+            )
+    return added
+
+
+def remove_user_recipes(model, user_id, recipe_ids):
+    """
+    Удаляет рецепты из избранного или корзины одним DELETE ... RETURNING.
+
+    Возвращает множество id рецептов, которые были удалены.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return set()
+    table = connection.ops.quote_name(model._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} "
+            f"WHERE user_id = %s AND recipe_id IN "
+            f"({_placeholders(recipe_ids)}) "
+            f"RETURNING recipe_id",
+            [user_id, *recipe_ids]
+        )
+        removed = {recipe_id for recipe_id, in cursor.fetchall()}
+        change_counter(model, removed, -1)
+        if removed and model is ShoppingCart:
+            add_recipes_to_cart_totals(user_id, removed, sign=-1)
+    if removed:
+        invalidate_pagination_counts()
+        if model is Favorite:
+            transaction.on_commit(
+                lambda: invalidate_recipe_responses(*removed)
+            )
+    return removed
+
+
+def subscribe(follower_id, author_id):
+    """
+    Оформляет подписку одним INSERT ... ON CONFLICT DO NOTHING RETURNING
+    и увеличивает счётчик подписчиков автора.
+
+    Возвращает False, если подписка уже существует.
+    """
+    table = connection.ops.quote_name(Subscription._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (follower_id, author_id) "
+            f"VALUES (%s, %s) "
+            f"ON CONFLICT (follower_id, author_id) DO NOTHING "
+            f"RETURNING id",
+            [follower_id, author_id]
+        )
+        created = cursor.fetchone() is not None
+        if created:
+            change_counter(Subscription, [author_id], 1)
+    if created:
+        invalidate_pagination_counts()
+        bump_subscriptions_version(follower_id)
+    return created
+
+
+def unsubscribe(follower_id, author_id):
+    """
+    Отменяет подписку одним DELETE ... RETURNING и уменьшает счётчик
+    подписчиков автора.
+
+    Возвращает False, если подписки не было.
+    """
+    table = connection.ops.quote_name(Subscription._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} "
+            f"WHERE follower_id = %s AND author_id = %s "
+            f"RETURNING id",
+            [follower_id, author_id]
+        )
+        deleted = cursor.fetchone() is not None
+        if deleted:
+            change_counter(Subscription, [author_id], -1)
+    if deleted:
+        invalidate_pagination_counts()
+        bump_subscriptions_version(follower_id)
+    return deleted
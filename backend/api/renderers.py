@@ -0,0 +1,80 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson is not None else 0
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson.
+
+    Вывод совпадает с JSONRenderer байт в байт: ReturnDict и ReturnList
+    кодируются как dict и list, а даты, Decimal, ленивые строки и прочие
+    типы, которые orjson не знает, преобразуются кодировщиком DRF.
+    Ответы с отступами (?indent, Browsable API), настройки UNICODE_JSON
+    и COMPACT_JSON, отличные от умолчаний, целые больше 64 бит и
+    отсутствие orjson обрабатываются стандартным json.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=JSONEncoder().default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029, чтобы ответ
+        # оставался корректным JavaScript.
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Рендерер для выбора формата выгрузки через ?format= или Accept.
+
+    Сама выгрузка отдаётся потоковым ответом, поэтому через рендерер
+    проходят только ошибки, которые выводятся как JSON.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class PlainTextRenderer(ExportRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
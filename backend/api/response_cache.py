@@ -0,0 +1,161 @@
+import hashlib
+from time import monotonic, sleep
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from constants import (
+    PAGES_PAGINATION_PAGE_SIZE,
+    RESPONSE_CACHE_DETAIL_VERSION_KEY,
+    RESPONSE_CACHE_FIELDS_PARAMS,
+    RESPONSE_CACHE_LIST_VERSION_KEY,
+    RESPONSE_CACHE_POLL_INTERVAL,
+    RESPONSE_CACHE_PREFIX,
+    RESPONSE_CACHE_QUERY_PARAMS,
+)
+from foodgram.cache import is_cache_shared
+from .conditional import get_conditional_response
+from .serializers import get_sparse_fields
+
+DEFAULT_QUERY_PARAMS = {"page": 1, "limit": PAGES_PAGINATION_PAGE_SIZE}
+
+
+def _recipe_version_key(recipe_id):
+    return f"{RESPONSE_CACHE_PREFIX}:version:{recipe_id}"
+
+
+def _get_versions(*keys):
+    """Возвращает версии по ключам, создавая отсутствующие."""
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_recipe_lists():
+    """Сбрасывает все закэшированные списки рецептов."""
+    cache.set(RESPONSE_CACHE_LIST_VERSION_KEY, uuid4().hex, None)
+
+
+def invalidate_recipe_responses(*recipe_ids):
+    """Сбрасывает закэшированные рецепты и все списки рецептов."""
+    cache.delete_many([
+        _recipe_version_key(recipe_id) for recipe_id in recipe_ids
+    ])
+    invalidate_recipe_lists()
+
+
+def invalidate_all_recipe_responses():
+    """Сбрасывает все закэшированные рецепты и списки."""
+    cache.set(RESPONSE_CACHE_DETAIL_VERSION_KEY, uuid4().hex, None)
+    invalidate_recipe_lists()
+
+
+def get_response_cache_key(request, pk=None):
+    """
+    Ключ кэша ответа для анонимного GET-запроса.
+
+    В ключ входят хост (в ответах абсолютные ссылки), нормализованные
+    page, limit, author, fields и expand и версии кэша. Если запрос нельзя
+    кэшировать (пользователь авторизован, есть другие параметры или
+    значения некорректны), возвращает None. Если кэш не общий для
+    процессов, тоже возвращает None: сброс версий в одном воркере не
+    дошёл бы до ответов, закэшированных в других.
+    """
+    if (
+        request.method != "GET"
+        or request.user.is_authenticated
+        or not is_cache_shared()
+    ):
+        return None
+    params = request.query_params
+    if not set(params) <= {
+        *RESPONSE_CACHE_QUERY_PARAMS, *RESPONSE_CACHE_FIELDS_PARAMS
+    }:
+        return None
+    if any(len(params.getlist(name)) > 1 for name in params):
+        return None
+    normalized = []
+    for name in RESPONSE_CACHE_QUERY_PARAMS:
+        values = params.getlist(name)
+        if not values:
+            continue
+        if not values[0].isdigit():
+            return None
+        value = int(values[0])
+        if DEFAULT_QUERY_PARAMS.get(name) == value:
+            continue
+        normalized.append(f"{name}={value}")
+    for name, value in zip(
+        RESPONSE_CACHE_FIELDS_PARAMS, get_sparse_fields(request)
+    ):
+        if value is not None:
+            normalized.append(f"{name}={','.join(sorted(value))}")
+
+    if pk is None:
+        versions = _get_versions(RESPONSE_CACHE_LIST_VERSION_KEY)
+        kind = "list"
+    else:
+        # /api/recipes/0008/ и /api/recipes/8/ — один рецепт, а версии
+        # сбрасываются по целочисленному id.
+        pk = int(pk)
+        versions = _get_versions(
+            RESPONSE_CACHE_DETAIL_VERSION_KEY, _recipe_version_key(pk)
+        )
+        kind = f"detail:{pk}"
+    digest = hashlib.md5(
+        "|".join(
+            [request.scheme, request.get_host(), *versions, *normalized]
+        ).encode()
+    ).hexdigest()
+    return f"{RESPONSE_CACHE_PREFIX}:{kind}:{digest}"
+
+
+def get_cached_response(request, key, get_response):
+    """
+    Возвращает ответ из кэша или вычисляет его через get_response.
+
+    Кэшируются только ответы 200 вместе с их ETag, поэтому повторный
+    запрос с If-None-Match получает 304 без обращения к базе. Холодный
+    ключ вычисляет один воркер: остальные ждут, пока он положит ответ
+    в кэш, но не дольше RESPONSE_CACHE_LOCK_TIMEOUT, после чего
+    считают ответ сами.
+    """
+    cached = cache.get(key)
+    if cached is not None:
+        return _cached_response(request, *cached)
+
+    lock_key = f"{key}:lock"
+    lock_timeout = settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    deadline = monotonic() + lock_timeout
+    locked = cache.add(lock_key, True, lock_timeout)
+    while not locked and monotonic() < deadline:
+        sleep(RESPONSE_CACHE_POLL_INTERVAL)
+        cached = cache.get(key)
+        if cached is not None:
+            return _cached_response(request, *cached)
+        locked = cache.add(lock_key, True, lock_timeout)
+
+    try:
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key,
+                (response.data, response.get("ETag")),
+                settings.RESPONSE_CACHE_TIMEOUT
+            )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return response
+
+
+def _cached_response(request, data, etag):
+    if etag is None:
+        return Response(data)
+    return get_conditional_response(request, etag, lambda: Response(data))
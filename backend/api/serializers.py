@@ -1,10 +1,19 @@
+import copy
+
 from django.core.validators import MinValueValidator
-from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from constants import RECIPE_INGREDIENT_MIN_AMOUNT
+from constants import (
+    BULK_RECIPES_MAX_LENGTH,
+    BULK_USERS_MAX_LENGTH,
+    ID_MAX_VALUE,
+    RECIPE_INGREDIENT_MIN_AMOUNT,
+    SPARSE_EXPAND_QUERY_PARAM,
+    SPARSE_FIELDS_QUERY_PARAM,
+)
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -12,10 +21,65 @@ from recipes.models import (
     Recipe,
     ShoppingCart,
 )
+from recipes.shopping_cart import update_cart_totals_for_recipe
 from users.models import Subscription, User
 
 
-class UserSerializer(BaseUserSerializer):
+def get_sparse_fields(request):
+    """
+    Разбирает параметры ?fields= и ?expand= GET-запроса.
+
+    Возвращает пару (fields, expand): fields — множество запрошенных
+    полей или None, если нужны все поля; expand — множество полей,
+    которые нужно вывести развёрнутыми.
+    """
+    if request is None or request.method != "GET":
+        return None, set()
+
+    def parse(name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        return {field.strip() for field in value.split(",") if field.strip()}
+
+    return (
+        parse(SPARSE_FIELDS_QUERY_PARAM),
+        parse(SPARSE_EXPAND_QUERY_PARAM) or set(),
+    )
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет только поля из контекста fields (None — все поля) и
+    expand. Поля из collapsed_fields, не перечисленные в expand,
+    заменяются компактным представлением. Применяется только к корневому
+    сериализатору и элементам корневого списка: вложенные сериализаторы
+    выводятся целиком.
+    """
+
+    collapsed_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        requested = self.context.get("fields")
+        if parent is not None or requested is None:
+            return fields
+
+        expand = self.context.get("expand", set())
+        fields = {
+            name: field for name, field in fields.items()
+            if name in requested or name in expand
+        }
+        for name, field in self.collapsed_fields.items():
+            if name in fields and name not in expand:
+                fields[name] = copy.deepcopy(field)
+        return fields
+
+
+class UserSerializer(SparseFieldsMixin, BaseUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField(required=False)
 
@@ -31,6 +95,12 @@ class UserSerializer(BaseUserSerializer):
         )
 
     def get_is_subscribed(self, user):
+        is_subscribed = getattr(user, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
+        subscribed_author_ids = self.context.get("subscribed_author_ids")
+        if subscribed_author_ids is not None:
+            return user.id in subscribed_author_ids
         request_user = self.context["request"].user
         return request_user.is_authenticated and user.author.filter(follower=request_user).exists()
 
@@ -41,8 +111,47 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
+class IngredientPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который берёт продукты из заранее
+    загруженного словаря ingredients, если он задан.
+    """
+
+    ingredients = None
+
+    def to_internal_value(self, data):
+        if self.ingredients is None:
+            return super().to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            ingredient = self.ingredients.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if ingredient is None:
+            self.fail("does_not_exist", pk_value=data)
+        return ingredient
+
+
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """Загружает все продукты рецепта одним запросом перед проверкой."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                try:
+                    ids.add(int(item["id"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.child.fields["id"].ingredients = (
+                Ingredient.objects.in_bulk(ids)
+            )
+        return super().to_internal_value(data)
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = IngredientPrimaryKeyField(
         queryset=Ingredient.objects.all(),
         source="ingredient.id"
     )
@@ -55,17 +164,57 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ("id", "name", "measurement_unit", "amount")
+        list_serializer_class = RecipeIngredientListSerializer
+
+
+def get_subscribed_author_ids(user, author_ids):
+    """Id авторов из author_ids, на которых подписан user, одним запросом."""
+    if not user.is_authenticated or not author_ids:
+        return set()
+    return set(
+        Subscription.objects.filter(
+            follower=user, author_id__in=author_ids
+        ).values_list("author_id", flat=True)
+    )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Если автор рецепта выводится целиком, перед сериализацией списка
+    загружает подписки пользователя на авторов одним запросом и кладёт
+    их в контекст.
+    """
 
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        if (
+            isinstance(self.child.fields.get("author"), UserSerializer)
+            and "subscribed_author_ids" not in self.context
+        ):
+            self.context["subscribed_author_ids"] = get_subscribed_author_ids(
+                self.context["request"].user,
+                {recipe.author_id for recipe in recipes}
+            )
+        return super().to_representation(recipes)
 
-class RecipeSerializer(serializers.ModelSerializer):
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         source="recipe_ingredients", many=True
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    favorites_count = serializers.IntegerField(read_only=True)
     image = Base64ImageField()
 
+    collapsed_fields = {
+        "author": serializers.PrimaryKeyRelatedField(read_only=True),
+    }
+
     class Meta:
         model = Recipe
         fields = (
@@ -78,7 +227,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             "ingredients",
             "is_favorited",
             "is_in_shopping_cart",
+            "favorites_count",
         )
+        list_serializer_class = RecipeListSerializer
 
     def validate(self, data):
         if not data.get("recipe_ingredients"):
@@ -107,6 +258,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             })
         return image
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("recipe_ingredients")
         validated_data["author"] = self.context.get("request").user
@@ -114,12 +266,56 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._save_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop("recipe_ingredients")
-        instance.ingredients.clear()
-        self._save_ingredients(instance, ingredients_data)
+        self._update_ingredients(instance, ingredients_data)
         return super().update(instance, validated_data)
 
+    def _update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит состав рецепта к ingredients_data: изменённые количества
+        обновляются одним bulk_update, новые продукты добавляются одним
+        bulk_create, лишние удаляются одним DELETE. Неизменённые строки
+        не перезаписываются.
+        """
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        old_amounts = {
+            ingredient_id: recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in existing.items()
+        }
+        new_amounts = {
+            ingredient["ingredient"]["id"].id: ingredient["amount"]
+            for ingredient in ingredients_data
+        }
+
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ["amount"])
+
+        added = [
+            ingredient for ingredient in ingredients_data
+            if ingredient["ingredient"]["id"].id not in existing
+        ]
+        if added:
+            self._save_ingredients(recipe, added)
+
+        removed = existing.keys() - new_amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+
+        update_cart_totals_for_recipe(recipe.id, old_amounts, new_amounts)
+
     def _save_ingredients(self, recipe, ingredients_data):
         RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
@@ -130,7 +326,10 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient in ingredients_data
         )
 
-    def _check_existence(self, model, recipe):
+    def _check_existence(self, model, recipe, annotation):
+        annotated = getattr(recipe, annotation, None)
+        if annotated is not None:
+            return annotated
         request = self.context.get("request")
         return (
             request.user.is_authenticated
@@ -144,10 +343,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         return obj.image.url if obj.image else ""
 
     def get_is_favorited(self, recipe):
-        return self._check_existence(Favorite, recipe)
+        return self._check_existence(Favorite, recipe, "is_favorited")
 
     def get_is_in_shopping_cart(self, recipe):
-        return self._check_existence(ShoppingCart, recipe)
+        return self._check_existence(
+            ShoppingCart, recipe, "is_in_shopping_cart"
+        )
 
     def to_representation(self, instance):
         return super().to_representation(instance)
@@ -159,12 +360,35 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "image", "cooking_time")
 
 
+def get_recipes_limit(request):
+    """Возвращает значение параметра recipes_limit или None."""
+    recipes_limit = request.GET.get("recipes_limit")
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise serializers.ValidationError({
+            "detail": 'Параметр "recipes_limit" должен быть целым числом.'
+        })
+
+    if recipes_limit < 1:
+        raise serializers.ValidationError({
+            "detail": 'Параметр "recipes_limit" должен быть больше 0.'
+        })
+    return recipes_limit
+
+
 class SubscribedUserSerializer(UserSerializer):
+    """
+    Автор с превью рецептов.
+
+    Если в контексте передан словарь author_recipes (id автора -> список
+    рецептов), превью берутся из него без дополнительных запросов.
+    """
+
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(
-        source="recipes.count",
-        read_only=True,
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = (
@@ -174,96 +398,41 @@ class SubscribedUserSerializer(UserSerializer):
         )
 
     def get_recipes(self, author):
-        request = self.context.get("request")
-        recipes_limit = request.GET.get("recipes_limit")
-        if not recipes_limit:
-            recipes = author.recipes.all()
+        author_recipes = self.context.get("author_recipes")
+        if author_recipes is not None:
+            recipes = author_recipes.get(author.id, [])
         else:
-            try:
-                recipes_limit = int(recipes_limit)
-            except ValueError:
-                raise ValidationError({
-                    "detail": 'Параметр "recipes_limit" должен быть целым числом.'
-                })
-
-            if recipes_limit < 1:
-                raise ValidationError({
-                    "detail": 'Параметр "recipes_limit" должен быть больше 0.'
-                })
-
+            recipes_limit = get_recipes_limit(self.context.get("request"))
             recipes = author.recipes.all()[:recipes_limit]
 
         return ShortRecipeSerializer(recipes, many=True).data
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Subscription
-        fields = ("follower", "author")
-        read_only_fields = ("follower",)
-
-    def validate(self, data):
-        if not data.get("author"):
-            raise serializers.ValidationError(
-                {"detail": 'Поле "author" не может быть пустым.'}
-            )
-
-        request = self.context.get("request")
-        author = data["author"]
-        if author == request.user:
-            raise serializers.ValidationError(
-                {"detail": "Нельзя подписаться на самого себя."}
-            )
-
-        if Subscription.objects.filter(follower=request.user, author=author).exists():
-            raise serializers.ValidationError(
-                {"detail": "Подписка уже была оформлена."}
-            )
-
-        return data
-
-    def to_representation(self, instance):
-        data = SubscribedUserSerializer(instance.author, context=self.context).data
-        data["is_subscribed"] = True
-        return data
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=ID_MAX_VALUE),
+        allow_empty=False,
+        max_length=BULK_RECIPES_MAX_LENGTH,
+    )
 
 
-class BaseUserRecipeSerializer(serializers.ModelSerializer):
-    duplicate_error_message = "Элемент уже существует."
+class RelationsLookupSerializer(serializers.Serializer):
+    """Id пользователей и рецептов для проверки связей с текущим."""
 
-    class Meta:
-        abstract = True
-        fields = ("user", "recipe")
-        read_only_fields = ("user",)
+    users = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=ID_MAX_VALUE),
+        required=False,
+        max_length=BULK_USERS_MAX_LENGTH,
+    )
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=ID_MAX_VALUE),
+        required=False,
+        max_length=BULK_RECIPES_MAX_LENGTH,
+    )
 
     def validate(self, data):
-        if not data.get("recipe"):
-            raise serializers.ValidationError(
-                {"detail": 'Поле "recipe" не может быть пустым.'}
-            )
-
-        user = self.context["request"].user
-        recipe = data["recipe"]
-
-        if self.Meta.model.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {"detail": self.duplicate_error_message}
-            )
+        if not data.get("users") and not data.get("recipes"):
+            raise serializers.ValidationError({
+                "detail": 'Передайте параметр "users" или "recipes".'
+            })
         return data
-
-    def to_representation(self, instance):
-        return ShortRecipeSerializer(instance.recipe).data
-
-
-class FavoriteSerializer(BaseUserRecipeSerializer):
-    duplicate_error_message = "Рецепт уже добавлен в избранное."
-
-    class Meta(BaseUserRecipeSerializer.Meta):
-        model = Favorite
-
-
-class ShoppingCartSerializer(BaseUserRecipeSerializer):
-    duplicate_error_message = "Рецепт уже добавлен в корзину."
-
-    class Meta(BaseUserRecipeSerializer.Meta):
-        model = ShoppingCart
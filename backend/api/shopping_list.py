@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+from django.utils import timezone
+
+from recipes.models import ShoppingCartIngredient
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def get_cart_ingredients(user):
+    return ShoppingCartIngredient.objects.filter(
+        user=user, amount__gt=0
+    ).values_list(
+        "ingredient__name", "ingredient__measurement_unit", "amount"
+    ).order_by("ingredient__name").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def get_cart_recipe_names(user):
+    return user.shoppingcarts.values_list(
+        "recipe__name", flat=True
+    ).distinct().order_by("recipe__name").iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+def stream_txt(user):
+    today = timezone.now().strftime("%d.%m.%Y")
+    yield f"Список покупок на {today}:\nПродукты:\n"
+    for idx, (name, unit, amount) in enumerate(
+        get_cart_ingredients(user), start=1
+    ):
+        yield f"{idx}. {name.capitalize()} ({unit}) - {amount}\n"
+
+    yield "\nРецепты, для которых нужны эти продукты:"
+    for idx, recipe in enumerate(get_cart_recipe_names(user), start=1):
+        yield f"\n{idx}. {recipe}"
+
+
+def stream_csv(user):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush(row):
+        writer.writerow(row)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield flush(("name", "measurement_unit", "amount"))
+    for row in get_cart_ingredients(user):
+        yield flush(row)
+
+
+def stream_json(user):
+    yield (
+        '{"date":'
+        + json.dumps(timezone.now().date().isoformat())
+        + ',"ingredients":['
+    )
+    separator = ""
+    for name, unit, amount in get_cart_ingredients(user):
+        yield separator + _dump_ingredient(name, unit, amount)
+        separator = ","
+    yield '],"recipes":['
+    separator = ""
+    for recipe in get_cart_recipe_names(user):
+        yield separator + json.dumps(recipe, ensure_ascii=False)
+        separator = ","
+    yield "]}"
+
+
+def stream_ndjson(user):
+    for name, unit, amount in get_cart_ingredients(user):
+        yield _dump_ingredient(name, unit, amount) + "\n"
+
+
+def _dump_ingredient(name, unit, amount):
+    return json.dumps(
+        {"name": name, "measurement_unit": unit, "amount": amount},
+        ensure_ascii=False
+    )
+
+
+EXPORTERS = {
+    "txt": stream_txt,
+    "csv": stream_csv,
+    "json": stream_json,
+    "ndjson": stream_ndjson,
+}
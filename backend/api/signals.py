@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+from .conditional import bump_subscriptions_version
+from .pagination import invalidate_pagination_counts
+from .response_cache import (
+    invalidate_all_recipe_responses,
+    invalidate_recipe_responses,
+)
+from recipes.ingredient_index import bump_catalog_version
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from users.models import Subscription, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def reset_counts_on_create(sender, created, **kwargs):
+    if created:
+        invalidate_pagination_counts()
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def reset_counts_on_delete(sender, **kwargs):
+    invalidate_pagination_counts()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_ingredient_catalog(sender, **kwargs):
+    bump_catalog_version()
+    transaction.on_commit(invalidate_all_recipe_responses)
+
+
+@receiver(post_delete, sender=Token)
+def reset_token_on_delete(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def reset_tokens_on_user_change(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_tokens(
+            *Token.objects.filter(user=instance).values_list("key", flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reset_recipe_responses(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: invalidate_recipe_responses(recipe_id))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def reset_favorited_recipe_responses(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: invalidate_recipe_responses(recipe_id))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reset_recipe_ingredient_responses(sender, instance, origin=None,
+                                      **kwargs):
+    # Удаление через QuerySet делает RecipeSerializer, который затем
+    # сохраняет рецепт: ответы сбросит reset_recipe_responses, один раз
+    # на рецепт, а не на каждую удалённую строку.
+    if isinstance(origin, QuerySet):
+        return
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: invalidate_recipe_responses(recipe_id))
+
+
+@receiver(post_save, sender=User)
+def reset_author_responses(sender, instance, created, update_fields,
+                           **kwargs):
+    if created or update_fields == frozenset(["last_login"]):
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author=instance).values_list("id", flat=True)
+    )
+    if recipe_ids:
+        transaction.on_commit(
+            lambda: invalidate_recipe_responses(*recipe_ids)
+        )
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def reset_subscriptions_version(sender, instance, **kwargs):
+    bump_subscriptions_version(instance.follower_id)
@@ -1,23 +1,65 @@
-from django.db.models import F, Sum
+import hashlib
+from collections import defaultdict
+
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window,
+)
+from django.db.models.functions import RowNumber
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from djoser.views import UserViewSet as BaseUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (
     IsAuthenticated,
     IsAuthenticatedOrReadOnly
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from constants import (
+    FAVORITE_DUPLICATE_ERROR_MESSAGE,
+    ID_MAX_VALUE,
+    SELF_SUBSCRIPTION_ERROR_MESSAGE,
+    SHOPPING_CART_DUPLICATE_ERROR_MESSAGE,
+    SHOPPING_CART_EXPORT_FILENAME,
+    SUBSCRIPTION_DUPLICATE_ERROR_MESSAGE,
+)
+from .conditional import (
+    get_conditional_response,
+    get_recipe_etag,
+    get_user_etag,
+)
 from .filters import RecipeFilter
 from .pagination import PagesPagination
+from .readers import RecipeReader
 from .permissions import IsAuthorOrReadOnly
+from .renderers import CSVRenderer, NDJSONRenderer, PlainTextRenderer
+from .response_cache import get_cached_response, get_response_cache_key
+from .shopping_list import EXPORTERS
+from .relations import (
+    add_user_recipes,
+    remove_user_recipes,
+    subscribe,
+    unsubscribe,
+)
+from recipes.ingredient_index import get_catalog_version, ingredient_index
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -25,24 +67,132 @@ from recipes.models import (
     RecipeIngredient,
     ShoppingCart,
 )
+from recipes.shopping_cart import get_cart_version
 from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
     ShortRecipeSerializer,
     SubscribedUserSerializer,
-    SubscriptionSerializer,
     UserSerializer,
-    FavoriteSerializer,
-    ShoppingCartSerializer,
+    RecipeIdsSerializer,
+    RelationsLookupSerializer,
+    get_recipes_limit,
+    get_sparse_fields,
+    get_subscribed_author_ids,
 )
 from users.models import Subscription, User
 
 
+def get_object_id(value):
+    """
+    Id объекта из URL для запросов мимо ORM. lookup_value_regex
+    пропускает любые цифры, а id больше bigint PostgreSQL не сравнивает
+    с колонкой, поэтому такие id сразу дают 404.
+    """
+    object_id = int(value)
+    if not 0 < object_id <= ID_MAX_VALUE:
+        raise NotFound
+    return object_id
+
+
+def get_recipe_queryset(user, fields=None, expand=frozenset()):
+    """
+    Рецепты с автором, продуктами и флагами для пользователя.
+
+    Если задано множество fields (параметр ?fields=), загружается только
+    нужное: без продуктов не выполняется prefetch, без флагов — подзапросы,
+    а автор присоединяется, только если он выводится целиком.
+    """
+    def requested(name):
+        return fields is None or name in fields or name in expand
+
+    queryset = Recipe.objects.all()
+    if not requested("text"):
+        queryset = queryset.defer("text")
+    if requested("author") and (fields is None or "author" in expand):
+        queryset = queryset.select_related("author")
+    if requested("ingredients"):
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ).order_by("pk"),
+            )
+        )
+    for name, model in (
+        ("is_favorited", Favorite),
+        ("is_in_shopping_cart", ShoppingCart),
+    ):
+        if not requested(name):
+            continue
+        if not user.is_authenticated:
+            flag = Value(False, output_field=BooleanField())
+        else:
+            flag = Exists(
+                model.objects.filter(user=user, recipe=OuterRef("pk"))
+            )
+        queryset = queryset.annotate(**{name: flag})
+    return queryset
+
+
+def get_author_recipes(authors, recipes_limit=None):
+    """
+    Последние рецепты авторов одним запросом.
+
+    Ограничение recipes_limit применяется к каждому автору отдельно
+    с помощью ROW_NUMBER() OVER (PARTITION BY author_id).
+    """
+    recipes = Recipe.objects.filter(
+        author__in=[author.id for author in authors]
+    ).only("id", "name", "image", "cooking_time", "author_id")
+    if recipes_limit is not None:
+        recipes = recipes.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("created_at").desc(), F("id").desc()),
+            )
+        ).filter(row_number__lte=recipes_limit)
+
+    author_recipes = defaultdict(list)
+    for recipe in recipes.order_by("-created_at", "-id"):
+        author_recipes[recipe.author_id].append(recipe)
+    return author_recipes
+
+
 class UserViewSet(BaseUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = PagesPagination
+    keyset_ordering = None
     permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_value_regex = r"\d+"
+
+    def get_queryset(self):
+        user = self.request.user
+        fields, _ = get_sparse_fields(self.request)
+        if fields is not None and "is_subscribed" not in fields:
+            return super().get_queryset()
+        if not user.is_authenticated:
+            return super().get_queryset().annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return super().get_queryset().annotate(
+            is_subscribed=Exists(
+                Subscription.objects.filter(
+                    follower=user, author=OuterRef("pk")
+                )
+            )
+        )
+
+    def get_serializer_context(self):
+        fields, expand = get_sparse_fields(self.request)
+        return {
+            **super().get_serializer_context(),
+            "fields": fields,
+            "expand": expand,
+        }
 
     @action(
         detail=False,
@@ -51,7 +201,17 @@ class UserViewSet(BaseUserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def get_me(self, request):
-        return Response(self.get_serializer(request.user).data)
+        return self._conditional_profile(request, request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_profile(request, self.get_object())
+
+    def _conditional_profile(self, request, user):
+        return get_conditional_response(
+            request,
+            get_user_etag(request, user),
+            lambda: Response(self.get_serializer(user).data)
+        )
 
     @action(detail=False, methods=["put", "delete"], url_path="me/avatar")
     def change_avatar(self, request):
@@ -80,49 +240,105 @@ class UserViewSet(BaseUserViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
 
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="me/relations",
+        permission_classes=[IsAuthenticated]
+    )
+    def relations(self, request):
+        """
+        Подписки на пользователей ?users=, избранное и корзина для рецептов
+        ?recipes=: по одному запросу с IN на каждую таблицу.
+        """
+        serializer = RelationsLookupSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user_ids = list(dict.fromkeys(data.get("users", [])))
+        recipe_ids = list(dict.fromkeys(data.get("recipes", [])))
+
+        subscribed = get_subscribed_author_ids(request.user, user_ids)
+        favorited, in_shopping_cart = (
+            set(
+                model.objects.filter(
+                    user=request.user, recipe_id__in=recipe_ids
+                ).values_list("recipe_id", flat=True)
+            ) if recipe_ids else set()
+            for model in (Favorite, ShoppingCart)
+        )
+        return Response({
+            "users": [
+                {"id": user_id, "is_subscribed": user_id in subscribed}
+                for user_id in user_ids
+            ],
+            "recipes": [
+                {
+                    "id": recipe_id,
+                    "is_favorited": recipe_id in favorited,
+                    "is_in_shopping_cart": recipe_id in in_shopping_cart,
+                }
+                for recipe_id in recipe_ids
+            ],
+        })
+
     @action(
            detail=True,
            methods=["post", "delete"],
            url_path="subscribe"
        )
     def subscribe_and_unsubscribe(self, request, id=None):
-        author = get_object_or_404(User, pk=id)
         if request.method == "POST":
-            serializer = SubscriptionSerializer(
-                data={"author": author.id},
-                context={"request": request}
+            author = get_object_or_404(User, pk=id)
+            if author == request.user:
+                raise ValidationError({
+                    "detail": [SELF_SUBSCRIPTION_ERROR_MESSAGE]
+                })
+            if not subscribe(request.user.id, author.id):
+                raise ValidationError({
+                    "detail": [SUBSCRIPTION_DUPLICATE_ERROR_MESSAGE]
+                })
+            author.is_subscribed = True
+            serializer = SubscribedUserSerializer(
+                author, context={"request": request}
             )
-            serializer.is_valid(raise_exception=True)
-            subscription = serializer.save(follower=request.user)
-            return Response(serializer.to_representation(subscription), status=status.HTTP_201_CREATED)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        subscription = Subscription.objects.filter(follower=request.user, author=author).first()
-        if not subscription:
+        id = get_object_id(id)
+        if not unsubscribe(request.user.id, id):
+            get_object_or_404(User, pk=id)
             return Response(
                 {"detail": "Подписка не существует."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-
-    @action(detail=False, methods=["get"], url_path="subscriptions")
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="subscriptions",
+        keyset_ordering=("username", "id"),
+    )
     def subscriptions(self, request):
-        subscriptions = (
-            User.objects.filter(author__follower=request.user)
-        )
+        recipes_limit = get_recipes_limit(request)
+        subscriptions = User.objects.filter(
+            author__follower=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by("username")
 
         paginated_subscriptions = self.paginate_queryset(subscriptions)
 
-        serializer = SubscribedUserSerializer( 
-            paginated_subscriptions, 
-            many=True, 
-            context={'request': request} 
-        ) 
-
-        return self.get_paginated_response(serializer.data) 
+        context = self.get_serializer_context()
+        fields = context["fields"]
+        if fields is None or "recipes" in fields:
+            context["author_recipes"] = get_author_recipes(
+                paginated_subscriptions, recipes_limit
+            )
+        serializer = SubscribedUserSerializer(
+            paginated_subscriptions, many=True, context=context
+        )
 
+        return self.get_paginated_response(serializer.data)
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -130,11 +346,46 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     pagination_class = None
 
-    def get_queryset(self):
-        name = self.request.query_params.get("name")
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
         if name:
-            return self.queryset.filter(name__istartswith=name)
-        return self.queryset
+            return Response(ingredient_index.search(name))
+        return self._catalog_response(request)
+
+    @staticmethod
+    def _catalog_response(request):
+        """Полный каталог из заранее подготовленного и сжатого JSON."""
+        version, bodies = ingredient_index.get_catalog()
+        etags = {
+            encoding: f'"{version}-{encoding}"' for encoding in bodies
+        }
+        if_none_match = request.headers.get("If-None-Match", "")
+        for etag in etags.values():
+            if etag in if_none_match:
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                return response
+
+        accepted = {
+            value.split(";")[0].strip()
+            for value in request.headers.get("Accept-Encoding", "").split(",")
+        }
+        encoding = next(
+            (
+                encoding for encoding in ("br", "gzip")
+                if encoding in bodies and encoding in accepted
+            ),
+            "identity"
+        )
+        response = HttpResponse(
+            bodies[encoding], content_type="application/json"
+        )
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+        response["Content-Length"] = len(bodies[encoding])
+        response["ETag"] = etags[encoding]
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -142,42 +393,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     pagination_class = PagesPagination
+    keyset_ordering = ("-created_at", "-id")
+    lookup_value_regex = r"\d+"
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return get_recipe_queryset(
+            self.request.user, *get_sparse_fields(self.request)
+        )
+
+    def get_serializer_context(self):
+        fields, expand = get_sparse_fields(self.request)
+        return {
+            **super().get_serializer_context(),
+            "fields": fields,
+            "expand": expand,
+        }
+
+    def list(self, request, *args, **kwargs):
+        key = get_response_cache_key(request)
+        if key is None:
+            return self._conditional_list(request)
+        return get_cached_response(
+            request, key, lambda: self._conditional_list(request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        key = get_response_cache_key(request, kwargs[self.lookup_field])
+        if key is None:
+            return self._conditional_retrieve(request)
+        return get_cached_response(
+            request, key, lambda: self._conditional_retrieve(request)
+        )
+
+    def _conditional_list(self, request):
+        """
+        Список рецептов с ETag. Строки страницы загружаются из базы, но при
+        совпадении If-None-Match продукты и подписки не загружаются.
+        """
+        reader = RecipeReader(request, *get_sparse_fields(request))
+        queryset = reader.get_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(reader.read(list(queryset)))
+        envelope = self.get_paginated_response([]).data
+        return get_conditional_response(
+            request,
+            get_recipe_etag(request, page, envelope),
+            lambda: self.get_paginated_response(reader.read(page))
+        )
+
+    def _conditional_retrieve(self, request):
+        reader = RecipeReader(request, *get_sparse_fields(request))
+        row = get_object_or_404(
+            reader.get_values(self.get_queryset()),
+            **{self.lookup_field: self.kwargs[self.lookup_field]}
+        )
+        self.check_object_permissions(request, row)
+        return get_conditional_response(
+            request,
+            get_recipe_etag(request, [row]),
+            lambda: Response(reader.read([row])[0])
+        )
+
+    def perform_create(self, serializer):
+        recipe = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
+
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
+
     @staticmethod
-    def _toggle_favorite_or_shopping_cart(request, recipe, model):
-        serializer_class = (
-            FavoriteSerializer if model == Favorite else ShoppingCartSerializer
+    def _toggle_favorite_or_shopping_cart(request, pk, model):
+        duplicate_error_message = (
+            FAVORITE_DUPLICATE_ERROR_MESSAGE if model == Favorite
+            else SHOPPING_CART_DUPLICATE_ERROR_MESSAGE
         )
 
         if request.method == "POST":
-            serializer = serializer_class(
-                data={"recipe": recipe.id},
-                context={"request": request}
-            )
-            serializer.is_valid(raise_exception=True)
-            instance = serializer.save(user=request.user)
-            return Response(serializer.to_representation(instance), status=status.HTTP_201_CREATED)
-
-        instance_item = model.objects.filter(
-            user=request.user, 
-            recipe=recipe 
-        ).first()
-
-        if not instance_item: 
-            return Response( 
-                {"detail": "Рецепт отсутствует"}, 
-                status=status.HTTP_400_BAD_REQUEST 
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if not add_user_recipes(model, request.user.id, [recipe.id]):
+                raise ValidationError({
+                    "detail": [duplicate_error_message]
+                })
+            return Response(
+                ShortRecipeSerializer(recipe).data,
+                status=status.HTTP_201_CREATED
             )
 
-        instance_item.delete()
+        pk = get_object_id(pk)
+        if not remove_user_recipes(model, request.user.id, [pk]):
+            get_object_or_404(Recipe, pk=pk)
+            return Response(
+                {"detail": "Рецепт отсутствует"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=["post", "delete"], url_path="favorite")
     def change_favorited_recipes(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        return self._toggle_favorite_or_shopping_cart(request, recipe, Favorite)
+        return self._toggle_favorite_or_shopping_cart(request, pk, Favorite)
 
     @action(
         detail=True,
@@ -185,53 +502,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path="shopping_cart"
     )
     def change_shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        return self._toggle_favorite_or_shopping_cart(request, recipe, ShoppingCart)
+        return self._toggle_favorite_or_shopping_cart(
+            request, pk, ShoppingCart
+        )
 
     @staticmethod
-    def _prepare_text(request, ingredients):
-        today = timezone.now().strftime("%d.%m.%Y")
-        report_lines = [
-            f"Список покупок на {today}:",
-            "Продукты:",
-        ]
-
-        for idx, item in enumerate(ingredients, start=1):
-            name = item["ingredient_name"].capitalize()
-            unit = item["measurement_unit"]
-            amount = item["total_amount"]
-            report_lines.append(f"{idx}. {name} ({unit}) - {amount}")
-
-        recipe_names = request.user.shoppingcarts.values_list(
-            "recipe__name", flat=True
-        ).distinct().order_by("recipe__name")
-        report_lines.append("\nРецепты, для которых нужны эти продукты:")
-        for idx, recipe in enumerate(recipe_names, start=1):
-            report_lines.append(f"{idx}. {recipe}")
-
-        return "\n".join(report_lines)
+    def _bulk_change(request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+
+        if request.method == "POST":
+            added = add_user_recipes(model, request.user.id, recipe_ids)
+            found = added | set(
+                Recipe.objects.filter(
+                    id__in=set(recipe_ids) - added
+                ).values_list("id", flat=True)
+            ) if len(added) < len(recipe_ids) else added
+            results = [
+                {
+                    "id": recipe_id,
+                    "status": (
+                        "added" if recipe_id in added
+                        else "exists" if recipe_id in found
+                        else "not_found"
+                    ),
+                }
+                for recipe_id in recipe_ids
+            ]
+        else:
+            removed = remove_user_recipes(model, request.user.id, recipe_ids)
+            results = [
+                {
+                    "id": recipe_id,
+                    "status": "removed" if recipe_id in removed else "missing",
+                }
+                for recipe_id in recipe_ids
+            ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_change_favorited_recipes(self, request):
+        return self._bulk_change(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_change_shopping_cart(self, request):
+        return self._bulk_change(request, ShoppingCart)
 
     @action(
         detail=False,
         methods=["get"],
-        url_path="download_shopping_cart"
+        url_path="download_shopping_cart",
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            PlainTextRenderer,
+            CSVRenderer,
+            JSONRenderer,
+            NDJSONRenderer,
+        ],
     )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppingcarts__user=request.user
-        ).values(
-            ingredient_name=F("ingredient__name"),
-            measurement_unit=F("ingredient__measurement_unit")
-        ).annotate(
-            total_amount=Sum("amount")
-        ).order_by("ingredient__name")
-
-        report_text = self._prepare_text(request, ingredients)
-        return FileResponse(
-            report_text,
-            content_type="text/plain",
-            filename="shopping_cart.txt"
-        )
+        file_format = request.accepted_renderer.format
+        cart_version = get_cart_version(request.user.id)
+        etag = cart_version and '"{}"'.format(hashlib.md5(":".join((
+            cart_version,
+            get_catalog_version(),
+            timezone.now().date().isoformat(),
+            file_format,
+        )).encode()).hexdigest())
+        if etag and etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = StreamingHttpResponse(
+                EXPORTERS[file_format](request.user),
+                content_type=(
+                    f"{request.accepted_renderer.media_type}; charset=utf-8"
+                )
+            )
+            response["Content-Disposition"] = (
+                "attachment; "
+                f'filename="{SHOPPING_CART_EXPORT_FILENAME}.{file_format}"'
+            )
+        if etag:
+            response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
     @action(detail=True, methods=["get"], url_path="get-link")
     def get_link(self, request, pk=None):
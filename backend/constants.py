@@ -9,4 +9,29 @@ RECIPE_NAME_MAX_LENGTH = 256
 RECIPE_MIN_COOKING_TIME = 1
 RECIPE_INGREDIENT_MIN_AMOUNT = 1
 PAGES_PAGINATION_PAGE_SIZE_QUERY_PARAM = "limit"
-PAGES_PAGINATION_PAGE_SIZE = 6
\ No newline at end of file
+PAGES_PAGINATION_PAGE_SIZE = 6
+PAGES_PAGINATION_MODE_QUERY_PARAM = "pagination"
+PAGES_PAGINATION_CURSOR_MODE = "cursor"
+PAGES_PAGINATION_CURSOR_QUERY_PARAM = "cursor"
+PAGES_PAGINATION_COUNT_CACHE_PREFIX = "pagination-count"
+PAGES_PAGINATION_COUNT_VERSION_KEY = "pagination-count-version"
+INGREDIENT_CATALOG_VERSION_PK = 1
+SHOPPING_CART_VERSION_KEY = "shopping-cart-version"
+SHOPPING_CART_EXPORT_FILENAME = "shopping_cart"
+BULK_RECIPES_MAX_LENGTH = 100
+AUTH_TOKEN_CACHE_PREFIX = "auth-token"
+RESPONSE_CACHE_PREFIX = "recipe-response"
+RESPONSE_CACHE_LIST_VERSION_KEY = "recipe-response-list-version"
+RESPONSE_CACHE_DETAIL_VERSION_KEY = "recipe-response-detail-version"
+RESPONSE_CACHE_QUERY_PARAMS = ("page", "limit", "author")
+RESPONSE_CACHE_FIELDS_PARAMS = ("fields", "expand")
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+SUBSCRIPTIONS_VERSION_KEY = "subscriptions-version"
+BULK_USERS_MAX_LENGTH = 100
+SPARSE_FIELDS_QUERY_PARAM = "fields"
+SPARSE_EXPAND_QUERY_PARAM = "expand"
+SELF_SUBSCRIPTION_ERROR_MESSAGE = "Нельзя подписаться на самого себя."
+SUBSCRIPTION_DUPLICATE_ERROR_MESSAGE = "Подписка уже была оформлена."
+FAVORITE_DUPLICATE_ERROR_MESSAGE = "Рецепт уже добавлен в избранное."
+SHOPPING_CART_DUPLICATE_ERROR_MESSAGE = "Рецепт уже добавлен в корзину."
+ID_MAX_VALUE = 2 ** 63 - 1
@@ -0,0 +1,13 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_cache_shared():
+    """
+    Видят ли все процессы один и тот же кэш по умолчанию. LocMemCache
+    (значение CACHE_BACKEND по умолчанию) и DummyCache живут в памяти
+    процесса, поэтому хранить в них версии для ETag нельзя: другой
+    воркер или management-команда их не увидит.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
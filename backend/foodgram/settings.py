@@ -101,6 +101,14 @@ DATABASES = {
 }
 
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -152,7 +160,7 @@ AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
@@ -175,3 +183,43 @@ DJOSER = {
     },
     "HIDE_USERS": False,
 }
+
+# Кэширование количества объектов в PagesPagination: время жизни точного
+# значения (в секундах) и размер таблицы, начиная с которого для
+# нефильтрованных выборок используется оценка pg_class.reltuples.
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", 30))
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(os.getenv("PAGINATION_COUNT_ESTIMATE_THRESHOLD", 100000))
+
+# Кэш токенов в CachedTokenAuthentication: время жизни записи (в секундах),
+# размер LRU-кэша процесса и псевдоним общего кэша из CACHES. Пустой
+# псевдоним включает кэш в памяти процесса: выход и смену пароля сразу
+# видит только этот процесс, поэтому при нескольких воркерах нужно задать
+# общий кэш или AUTH_TOKEN_CACHE_TIMEOUT=0.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+AUTH_TOKEN_CACHE_MAX_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_MAX_SIZE", 10000))
+AUTH_TOKEN_SHARED_CACHE = os.getenv("AUTH_TOKEN_SHARED_CACHE", "")
+
+# Кэш ответов для анонимных запросов к списку и странице рецепта: время
+# жизни ответа и время, которое воркеры ждут чужого вычисления холодного
+# ключа (в секундах).
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300))
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.getenv("RESPONSE_CACHE_LOCK_TIMEOUT", 10))
+
+# Как часто (в секундах) каждый процесс перечитывает из базы версию
+# каталога продуктов: изменения каталога из других процессов видны в
+# поиске, полном каталоге и ETag с такой задержкой.
+INGREDIENT_CATALOG_VERSION_TTL = int(os.getenv("INGREDIENT_CATALOG_VERSION_TTL", 5))
+
+# JSON в API: "orjson" — ORJSONRenderer и ORJSONParser (без установленного
+# orjson они работают через стандартный json), "json" — классы DRF.
+API_JSON_BACKEND = os.getenv("API_JSON_BACKEND", "orjson")
+if API_JSON_BACKEND == "orjson":
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ]
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = [
+        "api.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ]
@@ -24,21 +24,28 @@ class RecipeIngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "author", "get_favorites_count")
+    list_display = (
+        "id",
+        "name",
+        "author",
+        "favorites_count",
+        "shopping_carts_count",
+    )
     search_fields = ("name", "author__username", "author__email")
     list_filter = ("author", "created_at")
     inlines = [RecipeIngredientInline]
 
-    @admin.display(description="Избранное")
-    def get_favorites_count(self, recipe):
-        return recipe.favorites.count()
-
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ("recipe", "ingredient", "amount")
     search_fields = ("recipe__name", "ingredient__name")
 
+    def delete_queryset(self, request, queryset):
+        # Удаление по одной строке, чтобы сигналы обновили корзины.
+        for recipe_ingredient in queryset:
+            recipe_ingredient.delete()
+
 
 @admin.register(Favorite, ShoppingCart)
 class FavoriteAndShoppingCartAdmin(admin.ModelAdmin):
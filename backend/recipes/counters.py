@@ -0,0 +1,64 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# Денормализованные счётчики: модель строк -> (модель со счётчиком,
+# поле счётчика, внешний ключ строк на модель со счётчиком).
+COUNTERS = {
+    Recipe: (User, "recipes_count", "author"),
+    Subscription: (User, "followers_count", "author"),
+    Favorite: (Recipe, "favorites_count", "recipe"),
+    ShoppingCart: (Recipe, "shopping_carts_count", "recipe"),
+}
+
+
+def change_counter(source, pks, delta):
+    """
+    Атомарно прибавляет delta к счётчику строк source у объектов pks
+    одним UPDATE с F(). Счётчик не опускается ниже нуля.
+    """
+    pks = list(pks)
+    if not pks or not delta:
+        return
+    model, field, _ = COUNTERS[source]
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    model.objects.filter(pk__in=pks).update(**{field: value})
+
+
+def count_rows(source, field):
+    """Подзапрос с количеством строк source, ссылающихся на объект."""
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{field: OuterRef("pk")}).order_by().values(
+                field
+            ).annotate(total=Count("pk")).values("total")
+        ),
+        0
+    )
+
+
+def find_counter_mismatches():
+    """Количество объектов с неверным значением для каждого счётчика."""
+    return {
+        f"{model._meta.model_name}.{field}": model.objects.exclude(
+            **{field: count_rows(source, foreign_key)}
+        ).count()
+        for source, (model, field, foreign_key) in COUNTERS.items()
+    }
+
+
+def reconcile_counters():
+    """
+    Пересчитывает все счётчики одним UPDATE на поле. Перезаписываются
+    только объекты с неверным значением. Возвращает их количество.
+    """
+    return {
+        f"{model._meta.model_name}.{field}": model.objects.exclude(
+            **{field: count_rows(source, foreign_key)}
+        ).update(**{field: count_rows(source, foreign_key)})
+        for source, (model, field, foreign_key) in COUNTERS.items()
+    }
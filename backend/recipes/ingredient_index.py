@@ -0,0 +1,126 @@
+import gzip
+import json
+import threading
+from bisect import bisect_left
+from time import monotonic
+from uuid import uuid4
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+
+from constants import INGREDIENT_CATALOG_VERSION_PK
+
+
+def get_catalog_version():
+    """Текущая версия каталога продуктов, см. IngredientIndex.get_version."""
+    return ingredient_index.get_version()
+
+
+def bump_catalog_version():
+    """Помечает каталог продуктов как изменённый."""
+    from .models import IngredientCatalogVersion
+
+    IngredientCatalogVersion.objects.update_or_create(
+        pk=INGREDIENT_CATALOG_VERSION_PK, defaults={"version": uuid4()}
+    )
+    ingredient_index.reset_version()
+
+
+class IngredientIndex:
+    """
+    Индекс каталога продуктов в памяти процесса.
+
+    Названия хранятся в отсортированном списке в casefold-виде, поиск по
+    началу названия выполняется бинарным поиском. Совпадения по подстроке
+    идут после совпадений по началу. Вместе с индексом готовится полный
+    каталог в JSON: без сжатия, в gzip и (если установлен brotli) в br.
+    Индекс перестраивается, когда меняется версия каталога в базе.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = (None, [], [], {})
+        # Версия каталога из базы и время её чтения по monotonic().
+        self._version = (None, 0.0)
+
+    def get_version(self):
+        """
+        Версия каталога из базы. Процесс перечитывает её не чаще раза
+        в INGREDIENT_CATALOG_VERSION_TTL секунд: тёплые запросы не
+        обращаются к базе, а изменения из других процессов
+        (load_ingredients, админка на другом воркере) видны с задержкой
+        не больше этого времени.
+        """
+        from .models import IngredientCatalogVersion
+
+        version, checked_at = self._version
+        now = monotonic()
+        if (
+            version is None
+            or now - checked_at >= settings.INGREDIENT_CATALOG_VERSION_TTL
+        ):
+            catalog, _ = IngredientCatalogVersion.objects.get_or_create(
+                pk=INGREDIENT_CATALOG_VERSION_PK
+            )
+            version = catalog.version.hex
+            self._version = (version, now)
+        return version
+
+    def reset_version(self):
+        """Заставляет следующий get_version перечитать версию из базы."""
+        self._version = (None, 0.0)
+
+    def search(self, query):
+        _, keys, items, _ = self._get_snapshot()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        contains = [
+            items[position]
+            for position, key in enumerate(keys)
+            if query in key and not start <= position < end
+        ]
+        return items[start:end] + contains
+
+    def get_catalog(self):
+        """Возвращает версию каталога и его JSON в разных кодировках."""
+        version, _, _, bodies = self._get_snapshot()
+        return version, bodies
+
+    def _get_snapshot(self):
+        version = self.get_version()
+        if self._snapshot[0] != version:
+            with self._lock:
+                if self._snapshot[0] != version:
+                    self._build(version)
+        return self._snapshot
+
+    def _build(self, version):
+        from .models import Ingredient
+
+        rows = sorted(
+            (name.casefold(), name, measurement_unit, pk)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        )
+        items = [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for _, name, measurement_unit, pk in rows
+        ]
+        body = json.dumps(
+            items, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+        bodies = {"identity": body, "gzip": gzip.compress(body)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body)
+        self._snapshot = (version, [row[0] for row in rows], items, bodies)
+
+
+ingredient_index = IngredientIndex()
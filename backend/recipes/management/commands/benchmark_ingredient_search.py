@@ -0,0 +1,53 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from api.serializers import IngredientSerializer
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = "Compare ingredient search via the in-memory index and the ORM"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queries", type=int, default=500,
+            help="Number of search queries to run"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed"
+        )
+
+    def handle(self, *args, **kwargs):
+        names = list(Ingredient.objects.values_list("name", flat=True))
+        if not names:
+            self.stderr.write(self.style.ERROR("Ingredient catalog is empty."))
+            return
+
+        rng = random.Random(kwargs["seed"])
+        queries = [
+            name[:rng.randint(1, min(len(name), 4))]
+            for name in rng.choices(names, k=kwargs["queries"])
+        ]
+
+        def search_orm(query):
+            return IngredientSerializer(
+                Ingredient.objects.filter(name__istartswith=query),
+                many=True
+            ).data
+
+        ingredient_index.search("")
+        for title, search in (
+            ("ORM", search_orm),
+            ("Index", ingredient_index.search),
+        ):
+            started = perf_counter()
+            for query in queries:
+                search(query)
+            elapsed = perf_counter() - started
+            self.stdout.write(
+                f"{title:<6} {elapsed / len(queries) * 1000:.3f} ms/query "
+                f"({len(queries) / elapsed:.0f} queries/s)"
+            )
@@ -0,0 +1,202 @@
+import random
+from itertools import accumulate, islice
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from api.pagination import invalidate_pagination_counts
+from recipes.counters import reconcile_counters
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from recipes.shopping_cart import rebuild_cart_totals
+from users.models import Subscription, User
+
+SYNTHETIC_IMAGE = "recipes/images/synthetic.png"
+SYNTHETIC_PASSWORD = "synthetic-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, recipes, subscriptions, favorites "
+        "and shopping carts for load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--recipes", type=int, default=10000,
+            help="Total number of recipes"
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, nargs=2, default=(3, 12),
+            metavar=("MIN", "MAX")
+        )
+        parser.add_argument(
+            "--subscriptions-per-user", type=int, default=10
+        )
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--cart-per-user", type=int, default=5)
+        parser.add_argument(
+            "--skew", type=float, default=1.1,
+            help=(
+                "Power-law exponent for author and recipe popularity "
+                "(0 means uniform)"
+            )
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--prefix", default="synthetic",
+            help="Username prefix for generated users"
+        )
+
+    def handle(self, *args, **kwargs):
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                "Ingredient catalog is empty, run load_ingredients first."
+            )
+        min_ingredients, max_ingredients = kwargs["ingredients_per_recipe"]
+        max_ingredients = min(max_ingredients, len(ingredient_ids))
+        min_ingredients = min(min_ingredients, max_ingredients)
+
+        self.rng = random.Random(kwargs["seed"])
+        self.batch_size = kwargs["batch_size"]
+        skew = kwargs["skew"]
+
+        user_ids = self._generate_users(kwargs["users"], kwargs["prefix"])
+        if not user_ids:
+            return
+        author_weights = self._power_law(len(user_ids), skew)
+        recipe_ids = self._generate_recipes(
+            kwargs["recipes"], user_ids, author_weights
+        )
+        self._bulk_insert(
+            RecipeIngredient,
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500)
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in self.rng.sample(
+                    ingredient_ids,
+                    self.rng.randint(min_ingredients, max_ingredients)
+                )
+            )
+        )
+
+        self._bulk_insert(
+            Subscription,
+            (
+                Subscription(follower_id=follower_id, author_id=author_id)
+                for follower_id in user_ids
+                for author_id in self._pick(
+                    user_ids, author_weights,
+                    kwargs["subscriptions_per_user"], exclude=follower_id
+                )
+            ),
+            ignore_conflicts=True
+        )
+        if recipe_ids:
+            recipe_weights = self._power_law(len(recipe_ids), skew)
+            for model, per_user in (
+                (Favorite, kwargs["favorites_per_user"]),
+                (ShoppingCart, kwargs["cart_per_user"]),
+            ):
+                self._bulk_insert(
+                    model,
+                    (
+                        model(user_id=user_id, recipe_id=recipe_id)
+                        for user_id in user_ids
+                        for recipe_id in self._pick(
+                            recipe_ids, recipe_weights, per_user
+                        )
+                    ),
+                    ignore_conflicts=True
+                )
+        rebuild_cart_totals(user_ids)
+        reconcile_counters()
+        invalidate_pagination_counts()
+        self.stdout.write(self.style.SUCCESS("Synthetic data generated!"))
+
+    def _generate_users(self, count, prefix):
+        start = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(SYNTHETIC_PASSWORD)
+        return self._bulk_insert(
+            User,
+            (
+                User(
+                    username=f"{prefix}{number}",
+                    email=f"{prefix}{number}@example.com",
+                    first_name=f"Имя{number}",
+                    last_name=f"Фамилия{number}",
+                    password=password,
+                )
+                for number in range(start, start + count)
+            ),
+            collect=True
+        )
+
+    def _generate_recipes(self, count, author_ids, author_weights):
+        return self._bulk_insert(
+            Recipe,
+            (
+                Recipe(
+                    name=f"Рецепт {number}",
+                    text=f"Описание рецепта {number}.",
+                    image=SYNTHETIC_IMAGE,
+                    author_id=author_id,
+                    cooking_time=self.rng.randint(1, 240),
+                )
+                for number, author_id in enumerate(
+                    self.rng.choices(
+                        author_ids, cum_weights=author_weights, k=count
+                    )
+                )
+            ),
+            collect=True
+        )
+
+    def _power_law(self, count, skew):
+        """Накопленные веса Zipf-распределения со случайными рангами."""
+        ranks = list(range(1, count + 1))
+        self.rng.shuffle(ranks)
+        return list(accumulate(rank ** -skew for rank in ranks))
+
+    def _pick(self, population, cum_weights, count, exclude=None):
+        picked = set(
+            self.rng.choices(population, cum_weights=cum_weights, k=count)
+        )
+        picked.discard(exclude)
+        return picked
+
+    def _bulk_insert(self, model, objects, ignore_conflicts=False,
+                     collect=False):
+        """
+        Вставляет объекты пачками по batch_size и печатает скорость.
+
+        При collect=True возвращает id созданных объектов.
+        """
+        started = perf_counter()
+        created = []
+        total = 0
+        objects = iter(objects)
+        while batch := list(islice(objects, self.batch_size)):
+            model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+            total += len(batch)
+            if collect:
+                created.extend(instance.pk for instance in batch)
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f"{model._meta.verbose_name_plural}: {total} rows, "
+            f"{total / elapsed if elapsed else 0:.0f} rows/s"
+        )
+        return created
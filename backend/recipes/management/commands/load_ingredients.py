@@ -1,33 +1,164 @@
+import csv
 import json
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from tqdm import tqdm
 
+from recipes.ingredient_index import bump_catalog_version
 from recipes.models import Ingredient
 
+READ_CHUNK_SIZE = 64 * 1024
+FORMATS = ("csv", "json", "ndjson")
+EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            item = json.loads(line)
+            yield item.get("name"), item.get("measurement_unit")
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != "[":
+                    raise ValueError("JSON file must contain an array.")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield item.get("name"), item.get("measurement_unit")
+        if not chunk:
+            return
+
+
+READERS = {"csv": read_csv, "json": read_json, "ndjson": read_ndjson}
+
 
 class Command(BaseCommand):
-    help = "Load ingredients from a JSON file"
+    help = "Load ingredients from a CSV, JSON or NDJSON file"
 
     def add_arguments(self, parser):
-        parser.add_argument("file_path", type=str, help="Path to the JSON file")
+        parser.add_argument(
+            "file_path", type=str, help="Path to the CSV, JSON or NDJSON file"
+        )
+        parser.add_argument(
+            "--format", choices=FORMATS,
+            help="File format (detected by extension by default)"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of rows per INSERT"
+        )
+        parser.add_argument(
+            "--prune", action="store_true",
+            help=(
+                "Delete ingredients missing from the file "
+                "(cascades to recipe ingredients)"
+            )
+        )
 
     def handle(self, *args, **kwargs):
         file_path = kwargs["file_path"]
+        file_format = kwargs["format"] or EXTENSIONS.get(
+            Path(file_path).suffix.lower()
+        )
+        if file_format is None:
+            self.stderr.write(self.style.ERROR(
+                "Error: unknown file format, use --format."
+            ))
+            return
+
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-
-            Ingredient.objects.all().delete()
-            for item in tqdm(data, ncols=100, desc="Loading"):
-                name = item.get("name")
-                measurement_unit = item.get("measurement_unit")
-
-                if name and measurement_unit:
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-            self.stdout.write(self.style.SUCCESS("Ingredients loaded successfully!"))
+            started = perf_counter()
+            count_before = Ingredient.objects.count()
+            with open(file_path, "r", encoding="utf-8", newline="") as file:
+                rows = tqdm(
+                    READERS[file_format](file), ncols=100, desc="Loading"
+                )
+                seen = self._load(rows, kwargs["batch_size"])
+            pruned = self._prune(seen) if kwargs["prune"] else 0
+            bump_catalog_version()
+
+            elapsed = perf_counter() - started
+            created = Ingredient.objects.count() - count_before + pruned
+            self.stdout.write(self.style.SUCCESS(
+                f"Ingredients loaded successfully! Rows: {len(seen)}, "
+                f"created: {created}, deleted: {pruned}, "
+                f"{len(seen) / elapsed:.0f} rows/s."
+            ))
         except Exception as error:
             self.stderr.write(self.style.ERROR(f"Error: {error}"))
-   
\ No newline at end of file
+
+    @staticmethod
+    def _load(rows, batch_size):
+        """
+        Вставляет продукты пачками, пропуская уже существующие.
+
+        Существующие записи не удаляются и сохраняют свои id.
+        """
+        seen = set()
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            ingredients = []
+            for name, measurement_unit in batch:
+                if not name or not measurement_unit:
+                    continue
+                key = (name.strip(), measurement_unit.strip())
+                if key not in seen:
+                    seen.add(key)
+                    ingredients.append(
+                        Ingredient(name=key[0], measurement_unit=key[1])
+                    )
+            Ingredient.objects.bulk_create(
+                ingredients, ignore_conflicts=True
+            )
+        return seen
+
+    @staticmethod
+    @transaction.atomic
+    def _prune(seen):
+        stale_ids = [
+            pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+            if (name, measurement_unit) not in seen
+        ]
+        Ingredient.objects.filter(id__in=stale_ids).delete()
+        return len(stale_ids)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCartIngredient
+from recipes.shopping_cart import rebuild_cart_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the aggregated shopping carts against ShoppingCart rows "
+        "and rebuild them from scratch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report mismatches, exit with an error if any"
+        )
+
+    def handle(self, *args, **kwargs):
+        totals = RecipeIngredient.objects.filter(
+            recipe__shoppingcarts__isnull=False
+        ).values(
+            "recipe__shoppingcarts__user", "ingredient"
+        ).annotate(total=Sum("amount")).values_list(
+            "recipe__shoppingcarts__user", "ingredient", "total"
+        )
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in totals.iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingCartIngredient.objects.values_list(
+                "user_id", "ingredient_id", "amount"
+            ).iterator()
+        }
+        mismatches = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        self.stdout.write(f"Mismatched rows: {len(mismatches)}")
+
+        if kwargs["check"]:
+            if mismatches:
+                raise CommandError("Aggregated shopping carts are stale.")
+            return
+
+        rebuild_cart_totals()
+        self.stdout.write(self.style.SUCCESS("Shopping carts rebuilt!"))
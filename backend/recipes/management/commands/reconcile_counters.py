@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import find_counter_mismatches, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the denormalized recipe and user counters against the "
+        "counted rows and fix the stale ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report mismatches, exit with an error if any"
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["check"]:
+            mismatches = find_counter_mismatches()
+            for counter, count in mismatches.items():
+                self.stdout.write(f"{counter}: {count} mismatched rows")
+            if any(mismatches.values()):
+                raise CommandError("Counters are stale.")
+            return
+
+        for counter, count in reconcile_counters().items():
+            self.stdout.write(f"{counter}: {count} rows fixed")
+        self.stdout.write(self.style.SUCCESS("Counters reconciled!"))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_cart_totals(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    totals = RecipeIngredient.objects.filter(
+        recipe__shoppingcarts__isnull=False
+    ).values(
+        'recipe__shoppingcarts__user', 'ingredient'
+    ).annotate(total=Sum('amount')).values_list(
+        'recipe__shoppingcarts__user', 'ingredient', 'total'
+    )
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, ingredient_id, total in totals.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_created_at_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Продукт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Продукт корзины',
+                'verbose_name_plural': 'Продукты корзин',
+                'default_related_name': 'cart_ingredients',
+                'constraints': [models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_user_ingredient')],
+            },
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 18:33
+
+import uuid
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    IngredientCatalogVersion = apps.get_model(
+        'recipes', 'IngredientCatalogVersion'
+    )
+    IngredientCatalogVersion.objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientCatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.UUIDField(default=uuid.uuid4, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия каталога продуктов',
+                'verbose_name_plural': 'Версии каталога продуктов',
+            },
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from uuid import uuid4
+
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -39,6 +41,25 @@ class Ingredient(models.Model):
         return f"{self.name} ({self.measurement_unit})"
 
 
+class IngredientCatalogVersion(models.Model):
+    """
+    Версия каталога продуктов. Единственная строка меняется вместе
+    с продуктами в той же транзакции, поэтому её видят все процессы.
+    """
+
+    version = models.UUIDField(
+        verbose_name="Версия",
+        default=uuid4
+    )
+
+    class Meta:
+        verbose_name = "Версия каталога продуктов"
+        verbose_name_plural = "Версии каталога продуктов"
+
+    def __str__(self):
+        return self.version.hex
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
 
@@ -83,11 +104,34 @@ class Recipe(models.Model):
         verbose_name="Дата создания"
     )
 
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения"
+    )
+
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="Количество добавлений в избранное",
+        default=0,
+        editable=False
+    )
+
+    shopping_carts_count = models.PositiveIntegerField(
+        verbose_name="Количество добавлений в корзину",
+        default=0,
+        editable=False
+    )
+
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("-created_at",)
         default_related_name = "recipes"
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="recipe_created_at_id_idx"
+            )
+        ]
 
     def __str__(self):
         return f"ID рецепта: {self.id} | {self.name}"
@@ -181,3 +225,42 @@ class ShoppingCart(BaseUserRecipe):
     class Meta(BaseUserRecipe.Meta):
         verbose_name = "Корзина покупок"
         verbose_name_plural = "Корзины покупок"
+
+
+class ShoppingCartIngredient(models.Model):
+    """
+    Суммарное количество продукта в корзине пользователя.
+
+    Поддерживается инкрементально при изменении корзины и состава
+    рецептов (см. recipes.shopping_cart).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь"
+    )
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Продукт"
+    )
+
+    amount = models.IntegerField(
+        verbose_name="Количество"
+    )
+
+    class Meta:
+        verbose_name = "Продукт корзины"
+        verbose_name_plural = "Продукты корзин"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_cart_user_ingredient"
+            )
+        ]
+        default_related_name = "cart_ingredients"
+
+    def __str__(self):
+        return f"{self.user.username}: {self.ingredient} - {self.amount}"
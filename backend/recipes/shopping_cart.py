@@ -0,0 +1,159 @@
+from collections import Counter
+from itertools import islice
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from constants import SHOPPING_CART_VERSION_KEY
+from foodgram.cache import is_cache_shared
+from .models import RecipeIngredient, ShoppingCart, ShoppingCartIngredient
+
+UPSERT_BATCH_SIZE = 500
+
+
+def get_cart_version(user_id):
+    """
+    Версия корзины пользователя для валидаторов кэша выгрузки. None,
+    если кэш не общий для процессов и версия может устареть.
+    """
+    if not is_cache_shared():
+        return None
+    keys = [
+        SHOPPING_CART_VERSION_KEY,
+        f"{SHOPPING_CART_VERSION_KEY}:{user_id}",
+    ]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return ":".join(versions[key] for key in keys)
+
+
+def bump_cart_versions(user_ids=None):
+    """Сбрасывает версии корзин пользователей (всех, если None)."""
+    if user_ids is None:
+        cache.set(SHOPPING_CART_VERSION_KEY, uuid4().hex, None)
+        return
+    version = uuid4().hex
+    cache.set_many(
+        {
+            f"{SHOPPING_CART_VERSION_KEY}:{user_id}": version
+            for user_id in user_ids
+        },
+        None
+    )
+
+
+def add_recipes_to_cart_totals(user_id, recipe_ids, sign=1):
+    """
+    Учитывает добавление (sign=1) или удаление (sign=-1) рецептов
+    одним INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    table = connection.ops.quote_name(ShoppingCartIngredient._meta.db_table)
+    source = connection.ops.quote_name(RecipeIngredient._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, ingredient_id, amount) "
+            f"SELECT %s, ingredient_id, %s * SUM(amount) FROM {source} "
+            f"WHERE recipe_id IN ({', '.join(['%s'] * len(recipe_ids))}) "
+            f"GROUP BY ingredient_id "
+            f"ON CONFLICT (user_id, ingredient_id) DO UPDATE "
+            f"SET amount = {table}.amount + excluded.amount",
+            [user_id, sign, *recipe_ids]
+        )
+    if sign < 0:
+        ShoppingCartIngredient.objects.filter(
+            user_id=user_id, amount__lte=0
+        ).delete()
+    bump_cart_versions([user_id])
+
+
+def update_cart_totals_for_recipe(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение состава рецепта в корзины, где он лежит."""
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items()
+        if delta
+    }
+    if not deltas:
+        return
+    user_ids = list(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            "user_id", flat=True
+        )
+    )
+    _apply_deltas(user_ids, deltas)
+
+
+def rebuild_cart_totals(user_ids=None):
+    """Пересчитывает суммарные корзины с нуля по ShoppingCart."""
+    # Условие на пользователя должно быть в том же filter(), что и
+    # isnull: иначе к многозначной связи добавится второй JOIN и суммы
+    # умножатся на число корзин с рецептом.
+    conditions = {"recipe__shoppingcarts__isnull": False}
+    existing = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        conditions["recipe__shoppingcarts__user__in"] = user_ids
+        existing = existing.filter(user__in=user_ids)
+    totals = RecipeIngredient.objects.filter(**conditions)
+    totals = totals.values(
+        "recipe__shoppingcarts__user", "ingredient"
+    ).annotate(total=Sum("amount")).values_list(
+        "recipe__shoppingcarts__user", "ingredient", "total"
+    )
+    with transaction.atomic():
+        existing.delete()
+        rows = iter(totals.iterator(chunk_size=UPSERT_BATCH_SIZE))
+        while batch := list(islice(rows, UPSERT_BATCH_SIZE)):
+            ShoppingCartIngredient.objects.bulk_create(
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=total
+                )
+                for user_id, ingredient_id, total in batch
+            )
+    bump_cart_versions(user_ids)
+
+
+def _apply_deltas(user_ids, deltas):
+    """
+    Прибавляет deltas ко всем пользователям из user_ids одним
+    INSERT ... ON CONFLICT DO UPDATE на пачку и удаляет обнулившиеся
+    строки.
+    """
+    if not user_ids or not deltas:
+        return
+    table = connection.ops.quote_name(ShoppingCartIngredient._meta.db_table)
+    rows = iter(
+        (user_id, ingredient_id, delta)
+        for user_id in user_ids
+        for ingredient_id, delta in deltas.items()
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        while batch := list(islice(rows, UPSERT_BATCH_SIZE)):
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, ingredient_id, amount) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT (user_id, ingredient_id) DO UPDATE "
+                f"SET amount = {table}.amount + excluded.amount",
+                [value for row in batch for value in row]
+            )
+        decreased = [
+            ingredient_id
+            for ingredient_id, delta in deltas.items()
+            if delta < 0
+        ]
+        if decreased:
+            ShoppingCartIngredient.objects.filter(
+                user_id__in=user_ids,
+                ingredient_id__in=decreased,
+                amount__lte=0
+            ).delete()
+    bump_cart_versions(user_ids)
@@ -0,0 +1,127 @@
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import COUNTERS, change_counter
+from .models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from .shopping_cart import (
+    add_recipes_to_cart_totals,
+    bump_cart_versions,
+    update_cart_totals_for_recipe,
+)
+from users.models import Subscription
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        add_recipes_to_cart_totals(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_cart_totals(sender, instance, **kwargs):
+    add_recipes_to_cart_totals(
+        instance.user_id, [instance.recipe_id], sign=-1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def reset_cart_versions(sender, instance, created, **kwargs):
+    if not created:
+        bump_cart_versions(
+            instance.shoppingcarts.values_list("user_id", flat=True)
+        )
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_saved_amount(sender, instance, **kwargs):
+    """Запоминает строку состава до сохранения для update_cart_totals."""
+    instance._saved_amount = (
+        RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+            "recipe_id", "ingredient_id", "amount"
+        ).first() if instance.pk is not None else None
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_cart_totals(sender, instance, **kwargs):
+    """
+    Переносит изменение строки состава в корзины, где лежит рецепт.
+
+    bulk_create и bulk_update сигналов не отправляют: код, который ими
+    пользуется (RecipeSerializer), обновляет корзины сам.
+    """
+    saved = instance.__dict__.pop("_saved_amount", None)
+    old_amounts = {}
+    if saved is not None:
+        recipe_id, ingredient_id, amount = saved
+        if recipe_id == instance.recipe_id:
+            old_amounts = {ingredient_id: amount}
+        else:
+            update_cart_totals_for_recipe(
+                recipe_id, {ingredient_id: amount}, {}
+            )
+    update_cart_totals_for_recipe(
+        instance.recipe_id,
+        old_amounts,
+        {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_cart_totals_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Вычитает удалённую строку состава из корзин. Учитывается только
+    RecipeIngredient.delete(): при удалении рецепта корзины обновляет
+    pre_delete ShoppingCart, при удалении продукта его строки в корзинах
+    удаляются каскадом, а удаление через QuerySet (RecipeSerializer)
+    обновляет корзины само.
+    """
+    if origin is instance:
+        update_cart_totals_for_recipe(
+            instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+        )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe(sender, instance, origin=None, **kwargs):
+    """
+    Обновляет updated_at рецепта при изменении его состава. Удаление
+    через QuerySet пропускается: его делает RecipeSerializer, который
+    затем сохраняет рецепт, и updated_at обновляет auto_now, а не
+    отдельный UPDATE на каждую строку.
+    """
+    if isinstance(origin, (Recipe, QuerySet)):
+        return
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        _, _, foreign_key = COUNTERS[sender]
+        change_counter(sender, [getattr(instance, f"{foreign_key}_id")], 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def decrement_counter(sender, instance, origin=None, **kwargs):
+    model, _, foreign_key = COUNTERS[sender]
+    target_id = getattr(instance, f"{foreign_key}_id")
+    if isinstance(origin, model) and origin.pk == target_id:
+        return
+    change_counter(sender, [target_id], -1)
@@ -13,6 +13,8 @@ class UserAdmin(UserAdmin):
         "first_name",
         "last_name",
         "password",
+        "recipes_count",
+        "followers_count",
     )
     search_fields = ("username", "email")
 
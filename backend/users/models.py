@@ -60,6 +60,18 @@ class User(AbstractUser):
         null=True
     )
 
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Количество рецептов",
+        default=0,
+        editable=False
+    )
+
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков",
+        default=0,
+        editable=False
+    )
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"